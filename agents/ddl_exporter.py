@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Set, Union
+
+from agents.ddl_generator import generate_ddl, generate_data_load_sql
+from agents.table_mapper import TableMapperAgent, copy_table_for_plant
+from agents.view_mapper import instantiate_view
+from core.dependency_resolver import resolve_creation_order
+from models.schema_objects import PlantSchema, SchemaObject, Table, View, MaterializedView
+from utils.naming_utils import NameMapping
+
+MANIFEST_FILE_NAME = "manifest.jsonl"
+SINGLE_SCRIPT_FILE_NAME = "onboarding.sql"
+
+@dataclass
+class PlantPlan:
+    plant: str
+    objects: List[SchemaObject]  # Already in creation order.
+    table_mapping: NameMapping
+
+def iter_template_plans(
+    schema: PlantSchema,
+    reference_plant: str,
+    view_templates: Dict[str, Union[View, MaterializedView]],
+    plants: Dict[str, Dict],
+    project_id: str,
+    object_names: Set[str] = None,
+    incremental_sync: Dict[str, Dict] = None,
+) -> Iterator[PlantPlan]:
+    """Lazily builds one plan per plant from the blueprint tables and view templates.
+
+    The reference plant itself and plants without a `discriminator_value` are skipped.
+
+    `view_templates` maps blueprint view names to templates from `ViewMapperAgent.map_view_template`.
+    `object_names`, when given, limits the plans to those blueprint objects. `incremental_sync` is the
+    config section of the same name, used to keep synced tables compatible with the sync SQL.
+    """
+    blueprint_objects = [
+        obj for obj in schema.tables + schema.views + schema.materialized_views
+        if object_names is None or obj.name in object_names
+    ]
+    # Blueprint names are stable, so the creation order is resolved once and reused for every plant.
+    blueprint_order = resolve_creation_order(blueprint_objects, schema.dependencies)
+    table_mapper = TableMapperAgent()
+
+    for plant, plant_config in plants.items():
+        if plant == reference_plant:
+            continue
+        discriminator_value = (plant_config or {}).get('discriminator_value')
+        if discriminator_value is None:
+            print(f"[WARNING] No discriminator value configured for {plant}. Skipping export for this plant.")
+            continue
+        table_mapping = table_mapper.map_tables(schema.tables, reference_plant, plant)
+        objects = []
+        for obj in blueprint_order:
+            if isinstance(obj, Table):
+                objects.append(copy_table_for_plant(obj, table_mapping.get(obj.name), project_id, plant, incremental_sync))
+            elif obj.name in view_templates:
+                objects.append(instantiate_view(view_templates[obj.name], plant, discriminator_value))
+        yield PlantPlan(plant=plant, objects=objects, table_mapping=table_mapping)
+
+def export_ddl_bundle(plans: Iterable[PlantPlan], output_dir: str, source_dataset: str = None, single_file: bool = False) -> str:
+    """Streams DDL (and data load SQL when `source_dataset` is given) for each plan to disk.
+
+    Writes `<plant>.sql` per plant, or one `onboarding.sql` script when `single_file` is set,
+    plus a `manifest.jsonl` with one line per plant. Each manifest `sha256` is the hash of the
+    plant's file, or in single-file mode of that plant's section of the script only. Plans are
+    consumed one at a time, so memory stays bounded by the largest single plant. Returns the manifest path.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+    script = open(os.path.join(output_dir, SINGLE_SCRIPT_FILE_NAME), 'w') if single_file else None
+
+    try:
+        with open(manifest_path, 'w') as manifest:
+            for plan in plans:
+                file_name = SINGLE_SCRIPT_FILE_NAME if single_file else f"{plan.plant}.sql"
+                out = script if single_file else open(os.path.join(output_dir, file_name), 'w')
+                try:
+                    # The digest covers every byte written for this plant, header included.
+                    digest = hashlib.sha256()
+                    def write(chunk: str):
+                        out.write(chunk)
+                        digest.update(chunk.encode('utf-8'))
+
+                    statements = 0
+                    write(f"-- Plant: {plan.plant}\n\n")
+                    for statement in _iter_plan_statements(plan, source_dataset):
+                        write(statement + "\n\n")
+                        statements += 1
+                finally:
+                    if not single_file:
+                        out.close()
+
+                manifest.write(json.dumps({
+                    "plant": plan.plant,
+                    "file": file_name,
+                    "objects": len(plan.objects),
+                    "statements": statements,
+                    "sha256": digest.hexdigest(),
+                    "sha256_scope": "section" if single_file else "file",
+                }) + "\n")
+                manifest.flush()
+    finally:
+        if script:
+            script.close()
+
+    return manifest_path
+
+def _iter_plan_statements(plan: PlantPlan, source_dataset: str) -> Iterator[str]:
+    if plan.objects:
+        yield f"CREATE SCHEMA IF NOT EXISTS `{plan.objects[0].project}.{plan.plant}`;"
+    for obj in plan.objects:
+        yield generate_ddl(obj)
+
+    if not source_dataset:
+        return
+    # Data is loaded only once every object exists, matching the order used by the app.
+    for obj in plan.objects:
+        if isinstance(obj, Table):
+            source_table_name = plan.table_mapping.source_name(obj.name)
+            if source_table_name:
+                yield generate_data_load_sql(obj, source_table_name, source_dataset) + ";"
+            else:
+                print(f"[WARNING] Could not find source table name for {obj.name}. Skipping data load for this table.")
@@ -1,3 +1,5 @@
+from typing import List, Union
+
 from models.schema_objects import Table, View, MaterializedView
 
 def generate_ddl(schema_object) -> str:
@@ -11,9 +13,67 @@ def generate_ddl(schema_object) -> str:
     else:
         raise TypeError(f"Unsupported schema object type: {type(schema_object)}")
 
+# The BigQuery API reports legacy type names; DDL needs their standard SQL equivalents.
+STANDARD_SQL_TYPES = {"INTEGER": "INT64", "FLOAT": "FLOAT64", "BOOLEAN": "BOOL"}
+
 def generate_table_ddl(table: Table) -> str:
-    columns = ",\n  ".join([f"{c.name} {c.data_type}" for c in table.columns])
-    return f"CREATE TABLE `{table.project}.{table.dataset}.{table.name}` (\n  {columns}\n);"
+    columns = ",\n  ".join([_column_definition(c) for c in table.columns])
+    clauses = [f"CREATE TABLE `{table.project}.{table.dataset}.{table.name}` (\n  {columns}\n)"]
+
+    partition_by = partition_expression(table)
+    if partition_by:
+        clauses.append(f"PARTITION BY {partition_by}")
+    if table.cluster_columns:
+        clauses.append(f"CLUSTER BY {', '.join(table.cluster_columns)}")
+    if table.options:
+        clauses.append(f"OPTIONS({', '.join(f'{key}={_option_value(value)}' for key, value in table.options.items())})")
+
+    return "\n".join(clauses) + ";"
+
+def _column_definition(column) -> str:
+    data_type = _column_type(column)
+    if column.mode == "REPEATED":
+        return f"{column.name} ARRAY<{data_type}>"
+    if column.mode == "REQUIRED":
+        return f"{column.name} {data_type} NOT NULL"
+    return f"{column.name} {data_type}"
+
+def _column_type(column) -> str:
+    if column.data_type.upper() in ("RECORD", "STRUCT"):
+        # BigQuery rejects a bare STRUCT; the field list is required.
+        if not column.fields:
+            raise ValueError(f"Cannot generate DDL for RECORD column '{column.name}': its fields are unknown.")
+        return f"STRUCT<{', '.join(_column_definition(f) for f in column.fields)}>"
+    return STANDARD_SQL_TYPES.get(column.data_type.upper(), column.data_type)
+
+def partition_expression(table: Union[Table, MaterializedView]) -> str:
+    """Returns the PARTITION BY expression that reproduces a table's or materialized view's partitioning, or "" if it has none."""
+    if table.range_partitioning:
+        r = table.range_partitioning
+        return f"RANGE_BUCKET({table.partition_column}, GENERATE_ARRAY({r['start']}, {r['end']}, {r['interval']}))"
+    if not table.partition_type and not table.partition_column:
+        return ""
+
+    # BigQuery partitions by day unless told otherwise.
+    unit = (table.partition_type or "DAY").upper()
+    if not table.partition_column:
+        # Ingestion-time partitioning.
+        return "_PARTITIONDATE" if unit == "DAY" else f"TIMESTAMP_TRUNC(_PARTITIONTIME, {unit})"
+
+    column_types = {c.name: c.data_type.upper() for c in table.columns}
+    column_type = column_types.get(table.partition_column, "TIMESTAMP")
+    if column_type == "DATE":
+        return table.partition_column if unit == "DAY" else f"DATE_TRUNC({table.partition_column}, {unit})"
+    if column_type == "DATETIME":
+        return f"DATETIME_TRUNC({table.partition_column}, {unit})"
+    return f"TIMESTAMP_TRUNC({table.partition_column}, {unit})"
+
+def _option_value(value) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (int, float)):
+        return f"{value:g}" if isinstance(value, float) else str(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
 
 def generate_view_ddl(view: View) -> str:
     return f"CREATE VIEW `{view.project}.{view.dataset}.{view.name}` AS\n{view.sql};"
@@ -27,11 +87,74 @@ def generate_materialized_view_ddl(mv: MaterializedView) -> str:
 
     options_str = f"OPTIONS({', '.join(options)})" if options else ""
 
-    partition_by_str = f"PARTITION BY {mv.partition_column}" if mv.partition_column else ""
+    partition_by = partition_expression(mv)
+    partition_by_str = f"PARTITION BY {partition_by}" if partition_by else ""
     cluster_by_str = f"CLUSTER BY {', '.join(mv.cluster_columns)}" if mv.cluster_columns else ""
 
     return f"""CREATE MATERIALIZED VIEW `{mv.project}.{mv.dataset}.{mv.name}`\n{partition_by_str}\n{cluster_by_str}\n{options_str}\nAS\n{mv.sql};"""
 
 def generate_data_load_sql(table: Table, source_table_name: str, source_dataset: str) -> str:
     """Generates the SQL to load data from the source table to the target table."""
-    return f"INSERT INTO `{table.project}.{table.dataset}.{table.name}` SELECT * FROM `{table.project}.{source_dataset}.{source_table_name}`"
+    return f"INSERT INTO `{table.project}.{table.dataset}.{table.name}` SELECT * FROM `{_source_table_path(table, source_table_name, source_dataset)}`"
+
+def generate_incremental_sync_sql(
+    table: Table,
+    source_table_name: str,
+    source_dataset: str,
+    discriminator_column: str,
+    discriminator_value,
+    watermark_column: str,
+    merge_keys: List[str] = None,
+) -> str:
+    """Generates a script that copies only the plant's source rows newer than the target's watermark.
+
+    The watermark is read from the target table itself, so re-running is idempotent and the
+    first run against an empty table loads the plant's full history. With `merge_keys` the
+    slice is MERGEd (rows at the watermark are re-read so late updates are applied); without
+    them it is appended.
+    """
+    target = f"`{table.project}.{table.dataset}.{table.name}`"
+    source = f"`{_source_table_path(table, source_table_name, source_dataset)}`"
+    plant_filter = f"{discriminator_column} = {sql_literal(discriminator_value)}"
+    # A script variable, unlike a scalar subquery, lets BigQuery prune source partitions. The plant filter
+    # keeps rows of other plants, e.g. from an unfiltered full load, from moving this plant's watermark.
+    # The variable name is unlikely to collide with a source column, which would shadow it.
+    declare = f"DECLARE _sync_watermark DEFAULT (SELECT MAX({watermark_column}) FROM {target} WHERE {plant_filter});"
+    comparison = ">=" if merge_keys else ">"
+    new_slice = (
+        f"SELECT * FROM {source}\n"
+        f"WHERE {plant_filter}\n"
+        f"  AND (_sync_watermark IS NULL OR {watermark_column} {comparison} _sync_watermark)"
+    )
+
+    if not merge_keys:
+        return f"{declare}\nINSERT INTO {target}\n{new_slice};"
+
+    on_clause = " AND ".join(f"T.{key} = S.{key}" for key in merge_keys)
+    update_columns = [c.name for c in table.columns if c.name not in merge_keys]
+    matched_clause = (
+        f"WHEN MATCHED THEN UPDATE SET {', '.join(f'{name} = S.{name}' for name in update_columns)}\n"
+        if update_columns else ""
+    )
+    return (
+        f"{declare}\n"
+        f"MERGE {target} T\n"
+        f"USING (\n{new_slice}\n) S\n"
+        f"ON {on_clause}\n"
+        f"{matched_clause}"
+        f"WHEN NOT MATCHED THEN INSERT ROW;"
+    )
+
+def _source_table_path(table: Table, source_table_name: str, source_dataset: str) -> str:
+    # `source_dataset` may already be project qualified, as written by config_generator.py.
+    if "." in source_dataset:
+        return f"{source_dataset}.{source_table_name}"
+    return f"{table.project}.{source_dataset}.{source_table_name}"
+
+def sql_literal(value) -> str:
+    """Renders a config or query result value as a BigQuery SQL literal."""
+    if isinstance(value, bool):
+        return str(value).upper()
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
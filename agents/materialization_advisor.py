@@ -0,0 +1,165 @@
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
+
+from core.bigquery_client import BigQueryClient
+from core.dependency_resolver import downstream_impact
+from models.schema_objects import Column, Table, View, MaterializedView
+
+GIB = 1024 ** 3
+# A view is worth materializing once one read scans at least this much...
+MATERIALIZE_MIN_BYTES = 1 * GIB
+# ...or once its expected cost across all readers (bytes x readers) reaches this.
+MATERIALIZE_MIN_SCORE = 10 * GIB
+MAX_CLUSTER_COLUMNS = 4
+
+@dataclass
+class MaterializationProposal:
+    view_name: str
+    action: str  # "materialize", "adjust_refresh" or "keep"
+    estimated_bytes: Optional[int]
+    dependents: int
+    score: float
+    materialized_view: Optional[MaterializedView] = None
+    reasons: List[str] = field(default_factory=list)
+
+class MaterializationAdvisorAgent:
+    def __init__(self, client: BigQueryClient, source_tables: List[Table] = None):
+        self.client = client
+        # Source tables, when known, let partition and cluster suggestions follow the base table layout.
+        self.source_tables = {table.name: table for table in source_tables or []}
+
+    def advise(self, views: Dict[str, View], dependencies: Dict[str, List[str]]) -> List[MaterializationProposal]:
+        """Ranks generated views by expected query cost and reuse, and proposes materializations.
+
+        `views` and `dependencies` are keyed by blueprint object name.
+        """
+        impact = downstream_impact(views.keys(), dependencies)
+        view_names = {view.name for view in views.values()}
+        proposals = []
+
+        for blueprint_name, view in views.items():
+            estimated_bytes = self.client.estimate_query_bytes(view.sql)
+            dependents = len(impact.get(blueprint_name, set()))
+            # Each dependent is another reader that re-runs this view's query.
+            score = (estimated_bytes or 0) * (1 + dependents)
+            proposal = MaterializationProposal(
+                view_name=blueprint_name, action="keep",
+                estimated_bytes=estimated_bytes, dependents=dependents, score=score,
+            )
+
+            if isinstance(view, MaterializedView):
+                self._review_refresh(view, proposal)
+            elif estimated_bytes is None:
+                proposal.reasons.append("No dry-run estimate available.")
+            elif estimated_bytes < MATERIALIZE_MIN_BYTES and score < MATERIALIZE_MIN_SCORE:
+                proposal.reasons.append(f"Scans {_format_bytes(estimated_bytes)} for {1 + dependents} reader(s); too cheap to materialize.")
+            else:
+                self._propose_materialization(view, view_names, proposal)
+            proposals.append(proposal)
+
+        return sorted(proposals, key=lambda p: p.score, reverse=True)
+
+    def _propose_materialization(self, view: View, view_names: set, proposal: MaterializationProposal):
+        try:
+            tree = sqlglot.parse_one(view.sql, read="bigquery")
+        except ParseError as e:
+            proposal.reasons.append(f"Cannot analyze SQL: {e}")
+            return
+
+        blocker = _materialization_blocker(tree, view_names)
+        if blocker:
+            proposal.reasons.append(f"Expensive, but cannot be materialized: {blocker}")
+            return
+
+        refresh_minutes = _suggest_refresh_minutes(proposal.estimated_bytes)
+        proposal.action = "materialize"
+        proposal.materialized_view = MaterializedView(
+            name=view.name,
+            project=view.project,
+            dataset=view.dataset,
+            sql=view.sql,
+            changes_made=list(view.changes_made) + ["Converted to a materialized view by the materialization advisor."],
+            warnings=list(view.warnings),
+            **self._suggest_layout(tree),
+            refresh_schedule=refresh_minutes * 60000,
+            auto_refresh=True,
+        )
+        proposal.reasons.append(
+            f"Scans {_format_bytes(proposal.estimated_bytes)} for {1 + proposal.dependents} reader(s); "
+            f"materialize with a {refresh_minutes} minute refresh."
+        )
+
+    def _review_refresh(self, mv: MaterializedView, proposal: MaterializationProposal):
+        if proposal.estimated_bytes is None:
+            proposal.reasons.append("No dry-run estimate available.")
+            return
+        suggested_minutes = _suggest_refresh_minutes(proposal.estimated_bytes)
+        current_minutes = int(float(mv.refresh_schedule) / 60000) if mv.refresh_schedule else None
+        if current_minutes and suggested_minutes / 4 <= current_minutes <= suggested_minutes * 4:
+            proposal.reasons.append(f"Refresh every {current_minutes} minutes suits {_format_bytes(proposal.estimated_bytes)} of data.")
+            return
+        proposal.action = "adjust_refresh"
+        proposal.materialized_view = replace(mv, refresh_schedule=suggested_minutes * 60000)
+        proposal.reasons.append(
+            f"Refresh every {current_minutes or 'default'} minutes does not suit {_format_bytes(proposal.estimated_bytes)} "
+            f"of data; suggest {suggested_minutes} minutes."
+        )
+
+    def _suggest_layout(self, tree: exp.Expression) -> dict:
+        # Output name of every plainly projected base column, e.g. `k AS key` maps k -> key.
+        outputs = {}
+        for select in tree.selects:
+            if isinstance(select.unalias(), exp.Column):
+                outputs.setdefault(select.unalias().name, select.alias_or_name)
+        base_tables = [self.source_tables[t.name] for t in tree.find_all(exp.Table) if t.name in self.source_tables]
+
+        layout = {"columns": [], "partition_column": None, "partition_type": None}
+        for table in base_tables:
+            # BigQuery requires a materialized view to be partitioned like its base table.
+            if table.partition_column in outputs and not table.range_partitioning:
+                column_types = {c.name: c.data_type for c in table.columns}
+                layout["partition_column"] = outputs[table.partition_column]
+                layout["partition_type"] = table.partition_type
+                layout["columns"] = [Column(name=layout["partition_column"], data_type=column_types.get(table.partition_column, "TIMESTAMP"))]
+                break
+
+        # Only grouped columns that appear in the output can cluster the view, under their output names.
+        group = tree.args.get("group")
+        cluster_by = [
+            outputs[col.name] for col in (group.expressions if group else [])
+            if isinstance(col, exp.Column) and col.name in outputs
+        ]
+        if not cluster_by:
+            cluster_by = [outputs[col] for table in base_tables for col in table.cluster_columns if col in outputs]
+        layout["cluster_columns"] = list(dict.fromkeys(cluster_by))[:MAX_CLUSTER_COLUMNS]
+        return layout
+
+def _materialization_blocker(tree: exp.Expression, view_names: set) -> Optional[str]:
+    """Returns why BigQuery would reject this query as a materialized view, or None."""
+    if not isinstance(tree, exp.Select):
+        return "only a single SELECT can be materialized"
+    if tree.args.get("order") or tree.args.get("limit"):
+        return "ORDER BY and LIMIT are not supported"
+    if tree.find(exp.Window):
+        return "window functions are not supported"
+    if tree.find(exp.CurrentTimestamp, exp.CurrentDate, exp.CurrentDatetime, exp.Rand):
+        return "non-deterministic functions are not supported"
+    for table in tree.find_all(exp.Table):
+        if table.name in view_names:
+            return f"it reads view `{table.name}`; materialized views can only read tables"
+    return None
+
+def _suggest_refresh_minutes(estimated_bytes: int) -> int:
+    # Refreshes scan the changed base data, so cheap views can refresh often and large ones less so.
+    if estimated_bytes < GIB:
+        return 15
+    if estimated_bytes < 100 * GIB:
+        return 30
+    return 60
+
+def _format_bytes(num_bytes: int) -> str:
+    return f"{num_bytes / GIB:.2f} GiB"
@@ -1,23 +1,163 @@
-from typing import List
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Set
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
 
 from models.schema_objects import SchemaObject, View, Table
 from core.bigquery_client import BigQueryClient
-from utils.sql_parser import get_tables_from_sql
+
+# Plans smaller than this are validated in-process; spawning workers costs more than it saves.
+PARALLEL_THRESHOLD = 32
+
+@dataclass
+class ValidationIssue:
+    object_name: str
+    kind: str  # "syntax", "reference" or "discriminator"
+    message: str
 
 class SchemaValidatorAgent:
-    def __init__(self, client: BigQueryClient):
+    def __init__(self, client: BigQueryClient = None, config: Dict = None, max_workers: int = None):
         self.client = client
+        self.config = config or {}
+        self.max_workers = max_workers or os.cpu_count() or 1
 
     def validate_schema(self, schema_objects: List[SchemaObject]) -> bool:
         """Validates the entire schema, including missing references and SQL syntax."""
-        all_object_names = {obj.name for obj in schema_objects}
-        is_valid = True
+        issues = self.validate(schema_objects)
+        for object_issues in issues.values():
+            for issue in object_issues:
+                print(f"[WARNING] {issue.kind.capitalize()} error in '{issue.object_name}': {issue.message}")
+        return not issues
+
+    def validate(self, schema_objects: List[SchemaObject], source_tables: Set[str] = None) -> Dict[str, List[ValidationIssue]]:
+        """Parses every view offline in the BigQuery dialect and returns issues keyed by object name.
+
+        `source_tables`, when given, is the set of table names known to exist in the
+        configured `source_dataset`; otherwise any table in that dataset is accepted.
+        """
+        context = _ValidationContext(
+            plan_names=frozenset(obj.name for obj in schema_objects),
+            plan_datasets=frozenset(obj.dataset for obj in schema_objects),
+            source_dataset=self.config.get('source_dataset'),
+            source_tables=frozenset(source_tables) if source_tables is not None else None,
+            discriminator_column=self.config.get('discriminator_column'),
+            discriminator_values={
+                plant: str(plant_config.get('discriminator_value'))
+                for plant, plant_config in (self.config.get('plants') or {}).items()
+                if plant_config and plant_config.get('discriminator_value') is not None
+            },
+        )
+        views = [(obj.name, obj.dataset, obj.sql) for obj in schema_objects if isinstance(obj, View)]
+
+        if len(views) < PARALLEL_THRESHOLD or self.max_workers == 1:
+            _init_worker(context)
+            results = [_validate_view(view) for view in views]
+        else:
+            chunksize = max(1, len(views) // (self.max_workers * 4))
+            # Spawn rather than fork: the host process runs threads and gRPC channels that must not be forked.
+            mp_context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp_context, initializer=_init_worker, initargs=(context,)) as executor:
+                results = list(executor.map(_validate_view, views, chunksize=chunksize))
+
+        return {name: issues for (name, _, _), issues in zip(views, results) if issues}
+
+@dataclass(frozen=True)
+class _ValidationContext:
+    plan_names: frozenset
+    plan_datasets: frozenset
+    source_dataset: Optional[str]
+    source_tables: Optional[frozenset]
+    discriminator_column: Optional[str]
+    discriminator_values: Dict[str, str]
+
+_context: Optional[_ValidationContext] = None
+
+def _init_worker(context: _ValidationContext):
+    # Shipped once per worker process instead of once per view.
+    global _context
+    _context = context
+
+def _validate_view(view) -> List[ValidationIssue]:
+    name, dataset, sql = view
+    if not sql:
+        return [ValidationIssue(name, "syntax", "View has no SQL.")]
+    try:
+        tree = sqlglot.parse_one(sql, read="bigquery")
+    except ParseError as e:
+        details = [f"{err['description']} (line {err['line']}, col {err['col']})" for err in e.errors]
+        return [ValidationIssue(name, "syntax", "; ".join(details) or str(e))]
+    if not isinstance(tree, exp.Query):
+        # Broken model output still parses, e.g. `SELEC * FRM x` as an alias or several statements as a block.
+        return [ValidationIssue(name, "syntax", f"Expected a single query, got {type(tree).__name__}.")]
+
+    issues = []
+    reads_source = False
+    cte_names = {cte.alias_or_name for cte in tree.find_all(exp.CTE)}
+    for table in tree.find_all(exp.Table):
+        if not table.name or (not table.db and table.name in cte_names):
+            continue
+        if _is_source_reference(table):
+            reads_source = True
+        elif not _is_plan_reference(table):
+            issues.append(ValidationIssue(name, "reference", f"References unknown object '{table.sql(dialect='bigquery')}'."))
+
+    # Views built only on other plan views inherit the plant filter from them.
+    issue = _check_discriminator(tree, dataset, require_filter=reads_source)
+    if issue:
+        issues.append(ValidationIssue(name, "discriminator", issue))
+    return issues
+
+def _is_source_reference(table: exp.Table) -> bool:
+    ctx = _context
+    if not ctx.source_dataset or not table.db:
+        return False
+    qualified = f"{table.catalog}.{table.db}" if table.catalog else table.db
+    if qualified == ctx.source_dataset or ctx.source_dataset.endswith(f".{qualified}"):
+        return ctx.source_tables is None or table.name in ctx.source_tables
+    return False
+
+def _is_plan_reference(table: exp.Table) -> bool:
+    ctx = _context
+    return table.name in ctx.plan_names and (not table.db or table.db in ctx.plan_datasets)
+
+def _check_discriminator(tree: exp.Expression, dataset: str, require_filter: bool = True) -> Optional[str]:
+    ctx = _context
+    expected = ctx.discriminator_values.get(dataset)
+    if not ctx.discriminator_column or expected is None:
+        return None
+
+    found = []
+    for predicate in tree.find_all(exp.EQ, exp.In):
+        column, values = _discriminator_operands(predicate, ctx.discriminator_column)
+        if column:
+            found.extend(values)
+    if not found and require_filter:
+        return f"No filter on discriminator column '{ctx.discriminator_column}'."
+    wrong = sorted({value for value in found if value != expected})
+    if wrong:
+        return f"Discriminator filter targets {wrong}, expected '{expected}'."
+    return None
 
-        for obj in schema_objects:
-            if isinstance(obj, View):
-                referenced_names = get_tables_from_sql(obj.sql)
-                for ref_name in referenced_names:
-                    if ref_name not in all_object_names:
-                        print(f"[WARNING] View '{obj.name}' references unknown object '{ref_name}'.")
+def _discriminator_operands(predicate: exp.Expression, discriminator_column: str):
+    if isinstance(predicate, exp.In):
+        sides = [(predicate.this, predicate.expressions)]
+    else:
+        sides = [(predicate.this, [predicate.expression]), (predicate.expression, [predicate.this])]
+    for column, others in sides:
+        if isinstance(column, exp.Column) and column.name.lower() == discriminator_column.lower():
+            values = [_literal_value(other) for other in others]
+            return column, [value for value in values if value is not None]
+    return None, []
 
-        return is_valid
+def _literal_value(node: exp.Expression) -> Optional[str]:
+    # Unwrap typed literals such as DATE '2008-01-01'.
+    while isinstance(node, (exp.Cast, exp.Paren)):
+        node = node.this
+    if isinstance(node, exp.Literal):
+        return node.this
+    return None
@@ -1,20 +1,24 @@
-from typing import List, Dict
+from dataclasses import replace
+from typing import Dict, List
 from models.schema_objects import Table
-from utils.naming_utils import generate_new_name
+from utils.naming_utils import NameMapping
 
 class TableMapperAgent:
-    def map_tables(self, tables: List[Table], source_plant: str, target_plant: str) -> Dict[str, str]:
+    def map_tables(self, tables: List[Table], source_plant: str, target_plant: str) -> NameMapping:
         """Maps table names from the source plant to the target plant, including fully qualified names."""
-        mapping = {}
+        mapping = NameMapping(source_plant, target_plant)
         for table in tables:
-            mapping[table.name] = generate_new_name(table.name, source_plant, target_plant)
+            mapping.add(table.name, table.dataset, table.project)
 
-            old_dataset_table = f"{table.dataset}.{table.name}"
-            new_dataset_table = f"{target_plant}.{generate_new_name(table.name, source_plant, target_plant)}"
-            mapping[old_dataset_table] = new_dataset_table
+        return mapping
 
-            old_full_table = f"{table.project}.{table.dataset}.{table.name}"
-            new_full_table = f"{table.project}.{target_plant}.{generate_new_name(table.name, source_plant, target_plant)}"
-            mapping[old_full_table] = new_full_table
+def copy_table_for_plant(table: Table, new_name: str, project_id: str, plant: str, incremental_sync: Dict = None) -> Table:
+    """Copies a blueprint table for a new plant so partitioning, clustering and options carry over.
 
-        return mapping
+    Tables with an `incremental_sync` entry drop `require_partition_filter`: the sync reads the
+    target's MAX(watermark) and MERGEs into it without a partition predicate.
+    """
+    options = dict(table.options or {})
+    if table.name in (incremental_sync or {}):
+        options.pop('require_partition_filter', None)
+    return replace(table, name=new_name, project=project_id, dataset=plant, options=options)
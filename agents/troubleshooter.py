@@ -4,6 +4,8 @@ from typing import Dict, Any
 import vertexai
 from vertexai.preview.generative_models import GenerativeModel, GenerationConfig
 
+from core.rate_limiter import get_rate_limiter
+
 class TroubleshootingAgent:
     def __init__(self, project_id: str, location: str = "us-central1"):
         vertexai.init(project=project_id, location=location)
@@ -14,6 +16,7 @@ class TroubleshootingAgent:
             top_k=32,
             max_output_tokens=1024,
         )
+        self.limiter = get_rate_limiter()
 
     def diagnose(self, error_message: str, context: Dict = None) -> Dict[str, Any]:
         """Diagnoses an error message and provides troubleshooting steps and a proposed fix."""
@@ -66,7 +69,9 @@ class TroubleshootingAgent:
         """
 
         try:
-            response = self.model.generate_content(
+            response = self.limiter.call(
+                "generative",
+                self.model.generate_content,
                 prompt_text,
                 generation_config=self.generation_config,
             )
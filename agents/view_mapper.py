@@ -2,12 +2,35 @@ import json
 import os
 import yaml
 import streamlit as st
+from dataclasses import replace
 from typing import Dict, Union
+from agents.ddl_generator import sql_literal
 from models.schema_objects import View, MaterializedView
+from utils.naming_utils import NameMapping
 
 import vertexai
 from vertexai.preview.generative_models import GenerativeModel, GenerationConfig
 
+from core.rate_limiter import get_rate_limiter
+
+# Placeholders left in plant-parameterized view templates, filled in by `instantiate_view`.
+TARGET_DATASET_PLACEHOLDER = "${target_dataset}"
+DISCRIMINATOR_PLACEHOLDER = "${discriminator_value}"
+
+def instantiate_view(template: Union[View, MaterializedView], target_plant: str, discriminator_value) -> Union[View, MaterializedView]:
+    """Fills a view template in for one plant without calling the model."""
+    # Plain replacement rather than string.Template, which would also collapse `$$` in the SQL.
+    sql = template.sql.replace(TARGET_DATASET_PLACEHOLDER, target_plant)
+    sql = sql.replace(DISCRIMINATOR_PLACEHOLDER, sql_literal(discriminator_value))
+    return replace(
+        template,
+        name=template.name.replace(TARGET_DATASET_PLACEHOLDER, target_plant),
+        dataset=target_plant,
+        sql=sql,
+        changes_made=list(template.changes_made),
+        warnings=list(template.warnings),
+    )
+
 class ViewMapperAgent:
     def __init__(self, project_id: str, location: str = "us-central1"):
         vertexai.init(project=project_id, location=location)
@@ -18,6 +41,7 @@ class ViewMapperAgent:
             top_k=32,
             max_output_tokens=8192,
         )
+        self.limiter = get_rate_limiter()
         self.config = self._load_config()
 
     def _load_config(self) -> Dict:
@@ -34,7 +58,7 @@ class ViewMapperAgent:
             return {}
 
     def map_view(
-        self, view: Union[View, MaterializedView], table_mapping: dict, target_plant: str, custom_instructions: str = ""
+        self, view: Union[View, MaterializedView], table_mapping: NameMapping, target_plant: str, custom_instructions: str = ""
     ) -> Union[View, MaterializedView, None]:
         """Map a view or materialized view to a new plant with AI assistance."""
 
@@ -43,7 +67,9 @@ class ViewMapperAgent:
             return None
 
         try:
-            response = self.model.generate_content(
+            response = self.limiter.call(
+                "generative",
+                self.model.generate_content,
                 prompt_text,
                 generation_config=self.generation_config,
             )
@@ -51,23 +77,19 @@ class ViewMapperAgent:
             cleaned_response = response.text.strip().replace("```json", "").replace("```", "")
             response_data = json.loads(cleaned_response)
 
+            # Any blueprint object the model left in place is pointed at its target plant counterpart.
             common_args = {
-                "name": response_data.get("new_view_name"),
+                "name": response_data.get("new_view_name") or table_mapping.new_name(view.name),
                 "project": view.project,
                 "dataset": target_plant,
-                "sql": response_data.get("translated_sql"),
+                "sql": table_mapping.rewrite_sql(response_data.get("translated_sql")),
                 "changes_made": response_data.get("changes_made", []),
                 "warnings": response_data.get("warnings", []),
             }
 
             if isinstance(view, MaterializedView):
-                return MaterializedView(
-                    **common_args,
-                    partition_column=view.partition_column,
-                    cluster_columns=view.cluster_columns,
-                    refresh_schedule=view.refresh_schedule,
-                    auto_refresh=view.auto_refresh,
-                )
+                # Columns, partitioning, clustering and refresh options carry over from the blueprint.
+                return replace(view, **common_args)
             else:
                 return View(**common_args)
 
@@ -76,11 +98,24 @@ class ViewMapperAgent:
             st.text_area("Failed Prompt", prompt_text, height=300)
             return None
 
-    def _build_prompt(self, view: Union[View, MaterializedView], table_mapping: dict, target_plant: str, custom_instructions: str) -> str:
+    def map_view_template(
+        self, view: Union[View, MaterializedView], template_mapping: NameMapping, custom_instructions: str = ""
+    ) -> Union[View, MaterializedView, None]:
+        """Translate a view once into a plant-parameterized template for `instantiate_view`.
+
+        `template_mapping` must map the blueprint plant to `TARGET_DATASET_PLACEHOLDER`.
+        """
+        return self.map_view(view, template_mapping, TARGET_DATASET_PLACEHOLDER, custom_instructions)
+
+    def _build_prompt(self, view: Union[View, MaterializedView], table_mapping: NameMapping, target_plant: str, custom_instructions: str) -> str:
         view_type = "Materialized View" if isinstance(view, MaterializedView) else "View"
         
         reference_plant = view.dataset
-        target_plant_config = self.config.get('plants', {}).get(target_plant)
+        is_template = target_plant == TARGET_DATASET_PLACEHOLDER
+        if is_template:
+            target_plant_config = {'discriminator_value': DISCRIMINATOR_PLACEHOLDER}
+        else:
+            target_plant_config = self.config.get('plants', {}).get(target_plant)
         reference_plant_config = self.config.get('plants', {}).get(reference_plant)
 
         if not target_plant_config or not reference_plant_config:
@@ -91,6 +126,13 @@ class ViewMapperAgent:
         source_dataset = self.config.get('source_dataset', 'unknown_source_dataset')
         ref_discriminator_val = reference_plant_config.get('discriminator_value', 'unknown_ref_value')
         target_discriminator_val = target_plant_config.get('discriminator_value', 'unknown_target_value')
+        template_instruction = (
+            f"6.  **Keep Placeholders:** `{TARGET_DATASET_PLACEHOLDER}` and `{DISCRIMINATOR_PLACEHOLDER}` are template "
+            "placeholders filled in per plant later. Copy them verbatim into `new_view_name` and `translated_sql`; "
+            f"`{DISCRIMINATOR_PLACEHOLDER}` is replaced with a complete SQL literal, so never wrap it in quotes."
+        ) if is_template else ""
+        # The placeholder stands for a whole literal, quotes included.
+        target_filter_value = DISCRIMINATOR_PLACEHOLDER if is_template else f"'{target_discriminator_val}'"
 
         return f'''
         You are an expert BigQuery data architect. Your task is to create the SQL for a new plant-specific view by modeling it after an existing one, following a strict three-tiered data architecture.
@@ -113,7 +155,7 @@ class ViewMapperAgent:
 
         **4. The Target (Your Output):**
         - **Target Dataset:** `{target_plant}`
-        - The new view must be filtered for the target plant. The new filtering condition is `WHERE {discriminator_column} = '{target_discriminator_val}'`.
+        - The new view must be filtered for the target plant. The new filtering condition is `WHERE {discriminator_column} = {target_filter_value}`.
 
         **Your Instructions:**
         1.  **Analyze:** Understand the business logic of the reference SQL.
@@ -121,6 +163,7 @@ class ViewMapperAgent:
         3.  **Replace Plant Filter:** Find the `WHERE` clause that filters for the reference plant (`{ref_discriminator_val}`) and replace it with the filter for the target plant (`{target_discriminator_val}`).
         4.  **Generate New Name:** Create a suitable new name for the view in the target dataset.
         5.  **Apply Custom Instructions:** {custom_instructions if custom_instructions else 'None'}
+        {template_instruction}
 
         **Provide the response as a single, valid JSON object with these keys:**
         - `new_view_name`: (string) A new name for the view in the `{target_plant}` dataset.
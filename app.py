@@ -2,15 +2,20 @@ import streamlit as st
 import graphviz
 import yaml
 import os
+import hashlib
 
 from config import get_gcp_project_id
 from core.bigquery_client import BigQueryClient
 from core.schema_analyzer import analyze_plant_schema
-from core.dependency_resolver import resolve_creation_order
-from agents.table_mapper import TableMapperAgent
-from agents.view_mapper import ViewMapperAgent
-from agents.ddl_generator import generate_ddl, generate_data_load_sql
+from core.dependency_resolver import resolve_creation_order, upstream_closure, downstream_impact
+from core.rate_limiter import get_rate_limiter
+from core.schema_fingerprint import fingerprint_plant, record_fingerprint, load_fingerprint_index, scan_for_drift
+from agents.table_mapper import TableMapperAgent, copy_table_for_plant
+from agents.view_mapper import ViewMapperAgent, TARGET_DATASET_PLACEHOLDER, instantiate_view
+from agents.ddl_generator import generate_ddl, generate_data_load_sql, generate_incremental_sync_sql, generate_materialized_view_ddl
 from agents.schema_validator import SchemaValidatorAgent
+from agents.ddl_exporter import PlantPlan, export_ddl_bundle, iter_template_plans
+from agents.materialization_advisor import MaterializationAdvisorAgent
 from models.schema_objects import Table, View, MaterializedView
 
 # --- Utility Functions ---
@@ -27,6 +32,46 @@ def load_config():
         st.error(f"Error loading or parsing `plant_onboarding_config.yaml`: {e}")
         return None
 
+def view_template_key(reference_plant: str, view_obj: View, custom_instr: str):
+    """Cache key for a generated view template.
+
+    Templates survive re-analysis while the config is re-read on every rerun, so the key covers the
+    reference view SQL and the config values baked into the translation as well as the instructions.
+    """
+    sql_hash = hashlib.sha256((view_obj.sql or "").encode('utf-8')).hexdigest()
+    return (reference_plant, view_obj.name, sql_hash, custom_instr, source_dataset, config.get('discriminator_column'))
+
+def get_load_sql(table: Table, incremental: bool, full_load_fallback: bool = False):
+    """Builds the full load or incremental watermark sync SQL for a plant table, or None if it cannot be loaded.
+
+    With `full_load_fallback`, used for freshly created tables, tables that cannot be synced get a full load instead.
+    """
+    # Find the original source table name from the mapping
+    source_table_name = st.session_state.table_mapping.source_name(table.name)
+    if not source_table_name:
+        st.warning(f"Could not find source table name for {table.name}. Skipping data load for this table.")
+        return None
+
+    print(f"[DEBUG] Target Table Name for Data Load: {table.name}, Source Table Name: {source_table_name}")
+    table_sync = (config.get('incremental_sync') or {}).get(source_table_name) or {}
+    discriminator_value = (config.get('plants', {}).get(new_plant) or {}).get('discriminator_value')
+    can_sync = bool(table_sync.get('watermark_column')) and discriminator_value is not None
+    if incremental and not can_sync and not full_load_fallback:
+        st.warning(f"No `incremental_sync` watermark or discriminator value configured for {source_table_name}. Skipping sync for this table.")
+        return None
+
+    if not incremental or not can_sync:
+        st.write(f"Loading data into `{table.name}` from `{source_dataset}.{source_table_name}`")
+        # THIS IS THE CRITICAL FIX: Use the central source_dataset from the config
+        return generate_data_load_sql(table, source_table_name, source_dataset)
+
+    st.write(f"Syncing new rows into `{table.name}` from `{source_dataset}.{source_table_name}` (watermark: `{table_sync['watermark_column']}`)")
+    return generate_incremental_sync_sql(
+        table, source_table_name, source_dataset,
+        config.get('discriminator_column'), discriminator_value,
+        table_sync['watermark_column'], table_sync.get('merge_keys'),
+    )
+
 # --- Page and Sidebar Setup ---
 st.set_page_config(layout="wide")
 st.title("BigQuery Plant Onboarding System")
@@ -54,29 +99,54 @@ except ValueError as e:
 reference_plant = st.sidebar.text_input("Reference Plant Dataset (Blueprint)", "plant1")
 new_plant = st.sidebar.text_input("New Plant Dataset (Target)", "plant2")
 include_views = st.sidebar.checkbox("Include Views (and Materialized Views)", True)
+template_mode = st.sidebar.checkbox("Template Mode (translate each view once, reuse for every plant)", True)
 load_data = st.sidebar.checkbox(f"Load Table Data from `{source_dataset}`", True)
+incremental_sync = st.sidebar.checkbox("Incremental Sync (load only rows past each table's watermark)", False)
 dry_run = st.sidebar.checkbox("Dry Run (Preview DDL only)", True)
 
 
+if st.sidebar.button("Scan Fleet for Drift"):
+    fingerprint_index = load_fingerprint_index()
+    if not fingerprint_index:
+        st.sidebar.warning("No onboarded plants have been fingerprinted yet.")
+    else:
+        with st.spinner(f"Scanning {len(fingerprint_index)} onboarded plants for drift..."):
+            drift_report = scan_for_drift(BigQueryClient(project_id=project_id), fingerprint_index, config)
+        st.subheader("Fleet Drift Scan")
+        matching = len(fingerprint_index) - len(drift_report.drifted) - len(drift_report.errors)
+        st.write(f"{matching} of {len(fingerprint_index)} plants match their onboarded schema.")
+        for plant, error in drift_report.errors.items():
+            st.error(f"Could not fetch the live schema of `{plant}`: {error}")
+        for plant, drift in drift_report.drifted.items():
+            with st.expander(f"{plant}: {len(drift)} drifted object(s)"):
+                for obj_name, status in sorted(drift.items()):
+                    st.write(f"- `{obj_name}`: {status}")
+
 # --- Session State Initialization ---
 if 'schema' not in st.session_state:
     st.session_state.schema = None
 if 'new_schema_objects' not in st.session_state:
+    # Generated objects keyed by their blueprint name, so the blueprint dependency graph applies directly.
     st.session_state.new_schema_objects = {}
-if 'selected_objects' not in st.session_state:
-    st.session_state.selected_objects = []
 if 'table_mapping' not in st.session_state:
-    st.session_state.table_mapping = {}
+    st.session_state.table_mapping = None
 if 'view_instructions' not in st.session_state:
     st.session_state.view_instructions = {}
+if 'materialization_proposals' not in st.session_state:
+    st.session_state.materialization_proposals = []
+if 'view_templates' not in st.session_state:
+    # Survives re-analysis so onboarding further plants from the same blueprint reuses translations.
+    st.session_state.view_templates = {}
 
 # --- Main Application Logic ---
 if st.sidebar.button("Analyze Blueprint & Map Tables"):
     st.session_state.schema = None
     st.session_state.new_schema_objects = {}
-    st.session_state.selected_objects = []
-    st.session_state.table_mapping = {}
+    # Dropping the widget state lets the new blueprint start with every object selected.
+    st.session_state.pop('selected_objects', None)
+    st.session_state.table_mapping = None
     st.session_state.view_instructions = {}
+    st.session_state.materialization_proposals = []
 
     st.subheader("1. Analyzing Blueprint Schema & Mapping Tables")
     client = BigQueryClient(project_id=project_id)
@@ -86,7 +156,11 @@ if st.sidebar.button("Analyze Blueprint & Map Tables"):
     st.write(f"Found {len(schema.tables)} tables, {len(schema.views)} views, and {len(schema.materialized_views)} materialized views in blueprint `{reference_plant}`.")
 
     table_mapper = TableMapperAgent()
-    st.session_state.table_mapping = table_mapper.map_tables(schema.tables, reference_plant, new_plant)
+    table_mapping = table_mapper.map_tables(schema.tables, reference_plant, new_plant)
+    # Register blueprint views too so view-on-view references are rewritten for the target plant.
+    for view_obj in schema.views + schema.materialized_views:
+        table_mapping.add(view_obj.name, view_obj.dataset, view_obj.project)
+    st.session_state.table_mapping = table_mapping
     print(f"[DEBUG] Table Mapping: {st.session_state.table_mapping}")
 
     new_schema_objects_temp = {}
@@ -94,22 +168,46 @@ if st.sidebar.button("Analyze Blueprint & Map Tables"):
         new_name = st.session_state.table_mapping.get(table.name)
         print(f"[DEBUG] Original Table Name: {table.name}, New Name: {new_name}")
         if new_name:
-            new_schema_objects_temp[new_name] = Table(
-                name=new_name,
-                project=project_id,
-                dataset=new_plant,
-                columns=table.columns
+            new_schema_objects_temp[table.name] = copy_table_for_plant(
+                table, new_name, project_id, new_plant, config.get('incremental_sync')
             )
     st.session_state.new_schema_objects = new_schema_objects_temp
-    st.success("Blueprint analysis and table mapping complete. Now, you can generate the views.")
+    st.success("Blueprint analysis and table mapping complete. Now, choose the objects to migrate.")
+
+# --- Selective Migration (before translation, so only the chosen lineage is translated) ---
+if st.session_state.schema and st.session_state.new_schema_objects:
+    st.subheader("2. Selective Migration")
+    schema = st.session_state.schema
+    blueprint_objects = schema.tables + schema.views + schema.materialized_views
+    object_names = [obj.name for obj in blueprint_objects]
+    if 'selected_objects' not in st.session_state:
+        # One-time default; afterwards the widget owns the selection, so clearing it sticks.
+        st.session_state.selected_objects = object_names
+    st.multiselect("Choose objects to migrate:", options=object_names, key="selected_objects")
+
+    migration_closure = upstream_closure(st.session_state.selected_objects, schema.dependencies)
+    auto_included = sorted(migration_closure - set(st.session_state.selected_objects))
+    if auto_included:
+        st.info(f"Automatically included as upstream prerequisites: {', '.join(auto_included)}")
+
+    deselected = [name for name in object_names if name not in st.session_state.selected_objects]
+    if deselected:
+        with st.expander(f"Impact of {len(deselected)} deselected object(s)"):
+            for name, dependents in downstream_impact(deselected, schema.dependencies).items():
+                if name in migration_closure:
+                    st.write(f"- `{name}`: kept, required by {', '.join(sorted(dependents & migration_closure))}")
+                elif dependents:
+                    st.write(f"- `{name}`: dropped; downstream objects not migrated with it: {', '.join(sorted(dependents))}")
+                else:
+                    st.write(f"- `{name}`: dropped; nothing depends on it")
+
+    original_views_to_translate = [obj for obj in schema.views + schema.materialized_views if obj.name in migration_closure]
 
 # --- View Generation Section ---
-if st.session_state.schema and st.session_state.new_schema_objects and (st.session_state.schema.views or st.session_state.schema.materialized_views):
-    st.subheader("2. View Generation from Source")
-    st.write(f"The agent will use the views from `{reference_plant}` as a blueprint. It will then query the central source dataset (`{source_dataset}`) to build new views for `{new_plant}`. Provide any custom instructions below.")
+if st.session_state.schema and st.session_state.new_schema_objects and original_views_to_translate:
+    st.subheader("3. View Generation from Source")
+    st.write(f"The agent will use the {len(original_views_to_translate)} selected views from `{reference_plant}` as a blueprint. It will then query the central source dataset (`{source_dataset}`) to build new views for `{new_plant}`. Provide any custom instructions below.")
 
-    original_views_to_translate = st.session_state.schema.views + st.session_state.schema.materialized_views
-    
     current_view_instructions = st.session_state.view_instructions
 
     for view_obj in original_views_to_translate:
@@ -125,12 +223,30 @@ if st.session_state.schema and st.session_state.new_schema_objects and (st.sessi
         view_mapper = ViewMapperAgent(project_id=project_id)
         updated_new_schema_objects = st.session_state.new_schema_objects.copy()
 
+        if template_mode:
+            target_plant_config = config.get('plants', {}).get(new_plant) or {}
+            if 'discriminator_value' not in target_plant_config:
+                st.error(f"Config for target plant '{new_plant}' not in config file.")
+                st.stop()
+            template_mapping = TableMapperAgent().map_tables(st.session_state.schema.tables, reference_plant, TARGET_DATASET_PLACEHOLDER)
+            for view_obj in original_views_to_translate:
+                template_mapping.add(view_obj.name, view_obj.dataset, view_obj.project)
+
         for view_obj in original_views_to_translate:
             custom_instr = st.session_state.view_instructions.get(view_obj.name, "")
             with st.spinner(f"Generating {view_obj.schema_type.lower()} {view_obj.name} from source..."):
-                generated_view = view_mapper.map_.view(view_obj, st.session_state.table_mapping, new_plant, custom_instr)
+                if template_mode:
+                    template_key = view_template_key(reference_plant, view_obj, custom_instr)
+                    template = st.session_state.view_templates.get(template_key)
+                    if template is None:
+                        template = view_mapper.map_view_template(view_obj, template_mapping, custom_instr)
+                        if template:
+                            st.session_state.view_templates[template_key] = template
+                    generated_view = instantiate_view(template, new_plant, target_plant_config['discriminator_value']) if template else None
+                else:
+                    generated_view = view_mapper.map_view(view_obj, st.session_state.table_mapping, new_plant, custom_instr)
                 if generated_view:
-                    updated_new_schema_objects[generated_view.name] = generated_view
+                    updated_new_schema_objects[view_obj.name] = generated_view
                 else:
                     st.warning(f"Skipping {view_obj.schema_type.lower()} {view_obj.name} due to generation failure.")
         
@@ -139,16 +255,15 @@ if st.session_state.schema and st.session_state.new_schema_objects and (st.sessi
 
 # --- UI Rendering (Conditional on new_schema_objects being populated) ---
 if st.session_state.new_schema_objects:
-    st.subheader("3. Selective Migration")
-    object_names = list(st.session_state.new_schema_objects.keys())
-    st.session_state.selected_objects = st.multiselect(
-        "Choose objects to migrate:",
-        options=object_names,
-        default=object_names
-    )
-
-    filtered_objects = {name: obj for name, obj in st.session_state.new_schema_objects.items() if name in st.session_state.selected_objects}
-    ordered_objects = resolve_creation_order(list(filtered_objects.values()), st.session_state.schema.dependencies)
+    plan_objects = [obj for obj in blueprint_objects if obj.name in migration_closure]
+    pending_views = [obj.name for obj in original_views_to_translate if obj.name not in st.session_state.new_schema_objects]
+    if pending_views:
+        st.warning(f"{len(pending_views)} selected view(s) have not been generated yet and are left out of the plan: {', '.join(pending_views)}")
+    ordered_objects = [
+        st.session_state.new_schema_objects[obj.name]
+        for obj in resolve_creation_order(plan_objects, schema.dependencies)
+        if obj.name in st.session_state.new_schema_objects
+    ]
 
     st.subheader("4. Execution Plan & DDL Preview")
     st.write("The following objects will be created in the specified order. Expand each section to see the DDL and AI feedback.")
@@ -166,9 +281,71 @@ if st.session_state.new_schema_objects:
                     for warning in obj.warnings:
                         st.warning(warning)
 
-    if st.button("Execute Onboarding"):
-        if not dry_run:
+    with st.expander("Materialization Advisor"):
+        st.write("Ranks the planned views by dry-run bytes scanned and the number of downstream readers, and proposes materializing expensive, reused views or adjusting MV refresh schedules.")
+        if st.button("Run Materialization Advisor"):
             client = BigQueryClient(project_id=project_id)
+            source_project, _, source_dataset_id = source_dataset.rpartition('.')
+            advisor = MaterializationAdvisorAgent(client, client.get_tables(source_dataset_id, project_id=source_project or None))
+            planned_views = {
+                name: obj for name, obj in st.session_state.new_schema_objects.items()
+                if name in migration_closure and isinstance(obj, View)
+            }
+            with st.spinner(f"Estimating cost of {len(planned_views)} views..."):
+                st.session_state.materialization_proposals = advisor.advise(planned_views, schema.dependencies)
+
+        proposals = [p for p in st.session_state.materialization_proposals if p.view_name in st.session_state.new_schema_objects]
+        for proposal in proposals:
+            st.write(f"**{proposal.view_name}** ({proposal.action}): {' '.join(proposal.reasons)}")
+            if proposal.materialized_view:
+                st.code(generate_materialized_view_ddl(proposal.materialized_view), language="sql")
+        actionable = [p for p in proposals if p.materialized_view]
+        if actionable and st.button(f"Apply {len(actionable)} Proposal(s)"):
+            for proposal in actionable:
+                st.session_state.new_schema_objects[proposal.view_name] = proposal.materialized_view
+            st.session_state.materialization_proposals = []
+            st.rerun()
+
+    with st.expander("Export DDL Bundle"):
+        export_dir = st.text_input("Output Directory", f"ddl_export/{reference_plant}")
+        export_all_plants = st.checkbox("Export every configured plant (requires Template Mode)", False)
+        export_single_file = st.checkbox("Write a single ordered script instead of one file per plant", False)
+        if st.button("Export DDL"):
+            if export_all_plants:
+                view_templates = {
+                    view_obj.name: st.session_state.view_templates.get(
+                        view_template_key(reference_plant, view_obj, st.session_state.view_instructions.get(view_obj.name, ""))
+                    )
+                    for view_obj in original_views_to_translate
+                }
+                missing = [name for name, template in view_templates.items() if template is None]
+                if not template_mode or missing:
+                    st.error(f"Generate views in Template Mode first. Missing templates: {missing}")
+                    st.stop()
+                plans = iter_template_plans(
+                    schema, reference_plant, view_templates, config.get('plants', {}), project_id,
+                    migration_closure, config.get('incremental_sync')
+                )
+            else:
+                plans = [PlantPlan(plant=new_plant, objects=ordered_objects, table_mapping=st.session_state.table_mapping)]
+            with st.spinner(f"Exporting DDL to `{export_dir}`..."):
+                manifest_path = export_ddl_bundle(plans, export_dir, source_dataset if load_data else None, export_single_file)
+            st.success(f"DDL bundle written. Manifest: `{manifest_path}`")
+
+    if st.button("Execute Onboarding"):
+        client = BigQueryClient(project_id=project_id)
+        source_project, _, source_dataset_id = source_dataset.rpartition('.')
+        # Without a real client get_tables returns mock tables, so any source table name is accepted instead.
+        source_table_names = {
+            table.name for table in client.get_tables(source_dataset_id, project_id=source_project or None)
+        } if client.real_client else None
+        validation_issues = SchemaValidatorAgent(config=config).validate(ordered_objects, source_table_names)
+        if validation_issues:
+            st.error(f"Validation failed for {len(validation_issues)} object(s). Fix them before executing.")
+            for obj_name, issues in validation_issues.items():
+                for issue in issues:
+                    st.write(f"- `{obj_name}` ({issue.kind}): {issue.message}")
+        elif not dry_run:
             st.write(f"Creating dataset `{new_plant}` if it doesn't exist...")
             client.create_dataset_if_not_exists(new_plant)
 
@@ -182,24 +359,34 @@ if st.session_state.new_schema_objects:
 
             if load_data:
                 st.subheader(f"Loading Data from `{source_dataset}`")
-                tables_to_load = [obj for obj in ordered_objects if isinstance(obj, Table)]
-                for i, table in enumerate(tables_to_load):
-                    # Find the original source table name from the mapping
-                    source_table_name = None
-                    for k, v in st.session_state.table_mapping.items():
-                        if v == table.name:
-                            source_table_name = k
-                            break
-                    
-                    if source_table_name:
-                        print(f"[DEBUG] Target Table Name for Data Load: {table.name}, Source Table Name: {source_table_name}")
-                        st.write(f"Loading data into `{table.name}` from `{source_dataset}.{source_table_name}`")
-                        # THIS IS THE CRITICAL FIX: Use the central source_dataset from the config
-                        client.execute_ddl(generate_data_load_sql(table, source_table_name, source_dataset))
-                    else:
-                        st.warning(f"Could not find source table name for {table.name}. Skipping data load for this table.")
+                for table in [obj for obj in ordered_objects if isinstance(obj, Table)]:
+                    # The tables were just created, so any without a sync config get a one-time full load.
+                    load_sql = get_load_sql(table, incremental_sync, full_load_fallback=True)
+                    if load_sql:
+                        client.execute_ddl(load_sql)
 
+            # Remember what was deployed so fleet drift scans can compare against it.
+            record_fingerprint(fingerprint_plant(
+                ordered_objects, new_plant,
+                config.get('discriminator_column'),
+                (config.get('plants', {}).get(new_plant) or {}).get('discriminator_value'),
+            ))
             st.success("Onboarding complete!")
+            st.write("API throttling and retry metrics:")
+            st.json(get_rate_limiter().metrics())
             st.balloons()
         else:
-            st.info("Dry Run mode. No changes were made.")
\ No newline at end of file
+            st.info("Dry Run mode. No changes were made.")
+
+    if st.button("Sync Table Data"):
+        client = BigQueryClient(project_id=project_id) if not dry_run else None
+        for table in [obj for obj in ordered_objects if isinstance(obj, Table)]:
+            sync_sql = get_load_sql(table, incremental=True)
+            if sync_sql and dry_run:
+                st.code(sync_sql, language="sql")
+            elif sync_sql:
+                client.execute_ddl(sync_sql)
+        if dry_run:
+            st.info("Dry Run mode. No changes were made.")
+        else:
+            st.success("Incremental sync complete!")
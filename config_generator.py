@@ -1,16 +1,107 @@
 import argparse
 import yaml
 from collections import Counter
+from dataclasses import replace
 
 from config import get_gcp_project_id
 from core.bigquery_client import BigQueryClient
+from agents.ddl_generator import partition_expression, sql_literal
 
 CONFIG_FILE_PATH = "plant_onboarding_config.yaml"
+# BigQuery's per-table partition limit; beyond it a discriminator can only be clustered on.
+MAX_PARTITIONS = 10000
+MAX_CLUSTER_COLUMNS = 4
 
-def analyze_dataset_and_generate_config(source_project_id: str, source_dataset_id: str):
+def report_discriminator_layout(client: BigQueryClient, tables, discriminator: str, sample_value):
+    """
+    Prints how each source table's partitioning and clustering line up with the discriminator,
+    with dry-run estimates of bytes scanned for a full read and for one plant's slice.
+    """
+    for table in tables:
+        if table.partition_column == discriminator:
+            layout = "partitioned on the discriminator (per-plant reads prune to one partition)"
+        elif table.cluster_columns[:1] == [discriminator]:
+            layout = "clustered first on the discriminator (per-plant reads prune blocks)"
+        elif discriminator in table.cluster_columns:
+            layout = f"clustered on the discriminator at position {table.cluster_columns.index(discriminator) + 1} (weak pruning)"
+        else:
+            layout = "not partitioned or clustered on the discriminator (every plant scans the whole table)"
+
+        table_path = f"`{table.project}.{table.dataset}.{table.name}`"
+        full_bytes = client.estimate_query_bytes(f"SELECT * FROM {table_path}")
+        plant_bytes = client.estimate_query_bytes(f"SELECT * FROM {table_path} WHERE {discriminator} = {sql_literal(sample_value)}")
+        print(f"  - {table.name}: {layout}")
+        if full_bytes is not None and plant_bytes is not None:
+            # Dry runs account for partition pruning only; clustered tables usually scan less than estimated.
+            label = "Estimated bytes scanned per plant (upper bound, before cluster pruning)" if table.cluster_columns else "Estimated bytes scanned per plant"
+            print(f"      {label}: {plant_bytes:,} of {full_bytes:,} ({plant_bytes / max(full_bytes, 1):.1%})")
+
+def optimize_source_layout(client: BigQueryClient, tables, discriminator: str, distinct_values: int, target_dataset_id: str, dry_run: bool = False) -> str:
+    """
+    Creates copies of the source tables laid out for per-plant reads: partitioned on a DATE
+    discriminator when it fits in the partition limit, otherwise clustered first on it.
+    Returns the fully qualified dataset holding the copies.
+
+    The copies are snapshots: re-run this step (see `refresh_optimized_copies`) to pick up new source rows.
+    """
+    if not dry_run:
+        client.create_dataset_if_not_exists(target_dataset_id)
+
+    for table in tables:
+        column_types = {c.name: c.data_type.upper() for c in table.columns}
+        optimized = replace(table, project=client.project_id, dataset=target_dataset_id, range_partitioning=None)
+        if not table.partition_column:
+            # Ingestion-time partitioning cannot be combined with AS SELECT; rely on clustering instead.
+            optimized.partition_type = None
+        if column_types.get(discriminator) == "DATE" and distinct_values <= MAX_PARTITIONS:
+            optimized.partition_column, optimized.partition_type = discriminator, "DAY"
+            optimized.cluster_columns = [c for c in table.cluster_columns if c != discriminator]
+        else:
+            optimized.range_partitioning = table.range_partitioning
+            optimized.cluster_columns = ([discriminator] + [c for c in table.cluster_columns if c != discriminator])[:MAX_CLUSTER_COLUMNS]
+
+        clauses = [f"CREATE OR REPLACE TABLE `{optimized.project}.{optimized.dataset}.{optimized.name}`"]
+        partition_by = partition_expression(optimized)
+        if partition_by:
+            clauses.append(f"PARTITION BY {partition_by}")
+        if optimized.cluster_columns:
+            clauses.append(f"CLUSTER BY {', '.join(optimized.cluster_columns)}")
+        clauses.append(f"AS SELECT * FROM `{table.project}.{table.dataset}.{table.name}`")
+
+        print(f"  - Creating optimized copy of {table.name}")
+        client.execute_ddl("\n".join(clauses), dry_run=dry_run)
+
+    return f"{client.project_id}.{target_dataset_id}"
+
+def refresh_optimized_copies(source_project_id: str, source_dataset_id: str, optimized_dataset_id: str, dry_run: bool = False):
+    """
+    Rebuilds the discriminator-optimized copies from the current source tables using the
+    discriminator in the existing config, without regenerating the config. Run it on a
+    schedule (e.g. cron or a Cloud Scheduler job) to keep the copies current.
+    """
+    try:
+        with open(CONFIG_FILE_PATH, 'r') as f:
+            config = yaml.safe_load(f) or {}
+        client = BigQueryClient(project_id=get_gcp_project_id())
+    except (FileNotFoundError, ValueError) as e:
+        print(f"[ERROR] Configuration Error: {e}")
+        return
+
+    discriminator = config.get('discriminator_column')
+    if not discriminator:
+        print(f"[ERROR] No discriminator_column in `{CONFIG_FILE_PATH}`. Generate the config first.")
+        return
+
+    print(f"Refreshing optimized copies of {source_project_id}.{source_dataset_id} in `{optimized_dataset_id}`...")
+    tables = client.get_tables(source_dataset_id, project_id=source_project_id)
+    optimize_source_layout(client, tables, discriminator, len(config.get('plants') or {}), optimized_dataset_id, dry_run)
+
+def analyze_dataset_and_generate_config(source_project_id: str, source_dataset_id: str, optimized_dataset_id: str = None, dry_run: bool = False):
     """
     Scans a BigQuery dataset to find a common discriminator column,
     finds its unique values, and generates a plant_onboarding_config.yaml file.
+    With `optimized_dataset_id`, also copies the source tables into a layout
+    that prunes per-plant reads and points the config at the copies.
     """
     print(f"Starting analysis of dataset: {source_project_id}.{source_dataset_id}")
     
@@ -87,8 +178,27 @@ def analyze_dataset_and_generate_config(source_project_id: str, source_dataset_i
 
     print(f"Found {len(all_values)} unique values.")
 
-    # 6. Generate the YAML config file
-    print(f"\nStep 6: Generating `{CONFIG_FILE_PATH}`...")
+    # 6. Check the physical layout of the source tables against the discriminator
+    print(f"\nStep 6: Checking source table layout against discriminator '{chosen_discriminator}'...")
+    if all_values:
+        report_discriminator_layout(client, tables, chosen_discriminator, sorted(all_values)[0])
+
+    source_dataset = f"{source_project_id}.{source_dataset_id}"
+    if optimized_dataset_id:
+        print(f"\nStep 6b: Creating discriminator-optimized copies in `{optimized_dataset_id}`...")
+        try:
+            optimized_dataset = optimize_source_layout(client, tables, chosen_discriminator, len(all_values), optimized_dataset_id, dry_run)
+            if not dry_run:
+                source_dataset = optimized_dataset
+                print(
+                    f"[WARNING] `{optimized_dataset}` is a snapshot of the source tables and is not updated automatically. "
+                    f"Re-run with --refresh_optimized on a schedule to pick up new source rows."
+                )
+        except Exception as e:
+            print(f"[ERROR] Could not create optimized copies, keeping the original source dataset: {e}")
+
+    # 7. Generate the YAML config file
+    print(f"\nStep 7: Generating `{CONFIG_FILE_PATH}`...")
     plant_map = {}
     for i, value in enumerate(sorted(list(all_values))):
         plant_key = f"plant_{i+1}"
@@ -98,11 +208,20 @@ def analyze_dataset_and_generate_config(source_project_id: str, source_dataset_i
         }
 
     config_data = {
-        'source_dataset': f"{source_project_id}.{source_dataset_id}",
+        'source_dataset': source_dataset,
         'discriminator_column': chosen_discriminator,
         'plants': plant_map
     }
 
+    # Hand-maintained sections survive regeneration.
+    try:
+        with open(CONFIG_FILE_PATH, 'r') as f:
+            existing_config = yaml.safe_load(f) or {}
+        if existing_config.get('incremental_sync'):
+            config_data['incremental_sync'] = existing_config['incremental_sync']
+    except FileNotFoundError:
+        pass
+
     try:
         with open(CONFIG_FILE_PATH, 'w') as f:
             yaml.dump(config_data, f, default_flow_style=False, sort_keys=False)
@@ -115,6 +234,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate a plant onboarding config by scanning a BigQuery dataset.")
     parser.add_argument("--project_id", required=True, help="The BigQuery Project ID to scan (e.g., 'bigquery-public-data').")
     parser.add_argument("--dataset_id", required=True, help="The BigQuery Dataset ID to scan (e.g., 'austin_incidents').")
+    parser.add_argument("--optimized_dataset_id", help="Copy the source tables into this dataset, partitioned/clustered on the discriminator, and point the config at it.")
+    parser.add_argument("--dry_run", action="store_true", help="Print the optimized copy DDL instead of executing it.")
+    parser.add_argument("--refresh_optimized", action="store_true", help="Only rebuild the copies in --optimized_dataset_id from the current source tables, keeping the existing config.")
     args = parser.parse_args()
-    
-    analyze_dataset_and_generate_config(args.project_id, args.dataset_id)
\ No newline at end of file
+
+    if args.refresh_optimized:
+        if not args.optimized_dataset_id:
+            parser.error("--refresh_optimized requires --optimized_dataset_id")
+        refresh_optimized_copies(args.project_id, args.dataset_id, args.optimized_dataset_id, args.dry_run)
+    else:
+        analyze_dataset_and_generate_config(args.project_id, args.dataset_id, args.optimized_dataset_id, args.dry_run)
\ No newline at end of file
@@ -1,11 +1,53 @@
-from typing import List
-from models.schema_objects import Table, View, MaterializedView, Column
+import re
+import uuid
+from typing import Any, Dict, List, Optional
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
+from models.schema_objects import SchemaObject, Table, View, MaterializedView, Column
 from google.api_core.exceptions import NotFound, Conflict
+from core.rate_limiter import get_rate_limiter
+
+# INFORMATION_SCHEMA reports standard SQL type names; the table API, and so the rest of the app, uses legacy names.
+LEGACY_TYPE_NAMES = {"INT64": "INTEGER", "FLOAT64": "FLOAT", "BOOL": "BOOLEAN", "STRUCT": "RECORD"}
+# BigQuery's refresh interval for materialized views that don't set refresh_interval_minutes.
+DEFAULT_MV_REFRESH_MINUTES = 30
+
+# One query returns every object in a dataset with its columns and options.
+DATASET_OBJECTS_QUERY = """
+WITH cols AS (
+  SELECT table_name, ARRAY_AGG(STRUCT(column_name, data_type, is_nullable, is_partitioning_column, clustering_ordinal_position)
+                               ORDER BY ordinal_position) AS columns
+  FROM `{dataset}`.INFORMATION_SCHEMA.COLUMNS
+  WHERE is_hidden = 'NO'  -- Pseudo columns such as _PARTITIONTIME.
+  GROUP BY table_name
+),
+opts AS (
+  SELECT table_name, ARRAY_AGG(STRUCT(option_name, option_value)) AS options
+  FROM `{dataset}`.INFORMATION_SCHEMA.TABLE_OPTIONS
+  GROUP BY table_name
+)
+SELECT t.table_name, t.table_type, t.ddl, v.view_definition, cols.columns, opts.options
+FROM `{dataset}`.INFORMATION_SCHEMA.TABLES t
+LEFT JOIN `{dataset}`.INFORMATION_SCHEMA.VIEWS v USING (table_name)
+LEFT JOIN cols USING (table_name)
+LEFT JOIN opts USING (table_name)
+WHERE t.table_type IN ('BASE TABLE', 'VIEW', 'MATERIALIZED VIEW')
+"""
+
+# Statements that can be rerun without changing the result: CREATE OR REPLACE, IF [NOT] EXISTS DDL,
+# and MERGE or watermark scripts that recompute which rows are missing on every run. Plain CREATE is
+# not, since a rerun after the first job committed fails with "Already Exists".
+RETRY_SAFE_STATEMENT = re.compile(
+    r"\s*(CREATE\s+OR\s+REPLACE|MERGE|DECLARE)\b|\s*(CREATE|ALTER|DROP)\s+(\w+\s+)*?IF\s+(NOT\s+)?EXISTS\b",
+    re.IGNORECASE,
+)
 
 class BigQueryClient:
     def __init__(self, project_id: str, location: str = "US"):
         self.project_id = project_id
         self.location = location
+        self.limiter = get_rate_limiter()
         try:
             from google.cloud import bigquery
             self.client = bigquery.Client(project=project_id, location=location)
@@ -25,12 +67,12 @@ class BigQueryClient:
 
         dataset_ref = self.client.dataset(dataset_id)
         try:
-            self.client.get_dataset(dataset_ref)
+            self.limiter.call("metadata", self.client.get_dataset, dataset_ref)
         except NotFound:
             dataset = bigquery.Dataset(dataset_ref)
             dataset.location = self.location
             try:
-                self.client.create_dataset(dataset)
+                self.limiter.call("metadata", self.client.create_dataset, dataset)
             except Conflict:
                  pass # Race condition handling
             except Exception as e:
@@ -46,15 +88,16 @@ class BigQueryClient:
 
         tables = []
         try:
-            for bq_table in self.client.list_tables(f"{target_project}.{dataset_id}"):
+            for bq_table in self._list_tables(f"{target_project}.{dataset_id}"):
                 if bq_table.table_type == 'TABLE':
-                    table_ref = self.client.get_table(bq_table.reference)
-                    columns = [Column(name=f.name, data_type=f.field_type, mode=f.mode) for f in table_ref.schema]
+                    table_ref = self.limiter.call("metadata", self.client.get_table, bq_table.reference)
+                    columns = [_api_column(f) for f in table_ref.schema]
                     tables.append(Table(
                         name=table_ref.table_id,
                         project=table_ref.project,
                         dataset=table_ref.dataset_id,
-                        columns=columns
+                        columns=columns,
+                        **self._get_table_layout(table_ref)
                     ))
         except Exception as e:
             print(f"[ERROR] Could not fetch tables from {dataset_id}: {e}. Returning mock data.")
@@ -68,9 +111,9 @@ class BigQueryClient:
 
         views = []
         try:
-            for bq_table in self.client.list_tables(f"{self.project_id}.{dataset_id}"):
+            for bq_table in self._list_tables(f"{self.project_id}.{dataset_id}"):
                 if bq_table.table_type == 'VIEW':
-                    view_ref = self.client.get_table(bq_table.reference)
+                    view_ref = self.limiter.call("metadata", self.client.get_table, bq_table.reference)
                     views.append(View(
                         name=view_ref.table_id,
                         project=view_ref.project,
@@ -89,24 +132,72 @@ class BigQueryClient:
 
         mvs = []
         try:
-            for bq_table in self.client.list_tables(f"{self.project_id}.{dataset_id}"):
+            for bq_table in self._list_tables(f"{self.project_id}.{dataset_id}"):
                 if bq_table.table_type == 'MATERIALIZED_VIEW':
-                    mv_ref = self.client.get_table(bq_table.reference)
+                    mv_ref = self.limiter.call("metadata", self.client.get_table, bq_table.reference)
+                    layout = self._get_table_layout(mv_ref)
+                    # Materialized views take their expiration and filter requirements from the base table.
+                    layout.pop("options")
                     mvs.append(MaterializedView(
                         name=mv_ref.table_id,
                         project=mv_ref.project,
                         dataset=mv_ref.dataset_id,
                         sql=mv_ref.mview_query,
-                        partition_column=mv_ref.partitioning_field,
-                        cluster_columns=mv_ref.clustering_fields or [],
-                        refresh_schedule=mv_ref.refresh_time_interval_in_millis,
-                        auto_refresh=mv_ref.enable_refresh
+                        columns=[_api_column(f) for f in mv_ref.schema],
+                        **layout,
+                        refresh_schedule=mv_ref.mview_refresh_interval.total_seconds() * 1000 if mv_ref.mview_refresh_interval else None,
+                        auto_refresh=mv_ref.mview_enable_refresh
                     ))
         except Exception as e:
             print(f"[ERROR] Could not fetch materialized views from {dataset_id}: {e}. Returning empty list.")
             return []
         return mvs
 
+    def get_dataset_objects(self, dataset_id: str) -> List[SchemaObject]:
+        """Gets every table, view and materialized view in a dataset with a single INFORMATION_SCHEMA query.
+
+        Unlike the per-type getters, this makes no per-object API calls and raises instead of returning mock data.
+        """
+        if not self.real_client:
+            raise RuntimeError("BigQuery client is not available.")
+
+        sql = DATASET_OBJECTS_QUERY.format(dataset=f"{self.project_id}.{dataset_id}")
+        rows = self.limiter.call("jobs", lambda: list(self.client.query(sql).result()))
+
+        objects = []
+        for row in rows:
+            columns = row["columns"] or []
+            options = {o["option_name"]: o["option_value"] for o in row["options"] or []}
+            partition_column = next((c["column_name"] for c in columns if c["is_partitioning_column"] == "YES"), None)
+            cluster_columns = [
+                c["column_name"] for c in sorted(columns, key=lambda c: c["clustering_ordinal_position"] or 0)
+                if c["clustering_ordinal_position"]
+            ]
+            base = dict(name=row["table_name"], project=self.project_id, dataset=dataset_id)
+
+            if row["table_type"] == "VIEW":
+                objects.append(View(sql=row["view_definition"], **base))
+            elif row["table_type"] == "MATERIALIZED VIEW":
+                enable_refresh = options.get("enable_refresh")
+                objects.append(MaterializedView(
+                    sql=_ddl_query(row["ddl"]),
+                    columns=[_schema_column(c) for c in columns],
+                    partition_column=partition_column,
+                    cluster_columns=cluster_columns,
+                    **_ddl_partitioning(row["ddl"]),
+                    refresh_schedule=float(options.get("refresh_interval_minutes", DEFAULT_MV_REFRESH_MINUTES)) * 60000,
+                    auto_refresh=enable_refresh is None or enable_refresh.lower() == "true",
+                    **base
+                ))
+            else:
+                layout = _ddl_partitioning(row["ddl"])
+                if partition_column:
+                    layout["partition_column"] = partition_column
+                layout["cluster_columns"] = cluster_columns
+                layout["options"] = _table_options(options)
+                objects.append(Table(columns=[_schema_column(c) for c in columns], **base, **layout))
+        return objects
+
     def execute_ddl(self, ddl: str, dry_run: bool = False):
         """Executes a DDL statement in BigQuery."""
         if dry_run:
@@ -118,8 +209,15 @@ class BigQueryClient:
             job_config = bigquery.QueryJobConfig(use_legacy_sql=False)
             try:
                 print(f"[DEBUG] Executing DDL in BigQuery:\n{ddl}")
-                query_job = self.client.query(ddl, job_config=job_config)
-                query_job.result()  # Wait for the job to complete
+                if RETRY_SAFE_STATEMENT.match(ddl):
+                    # Submit and wait under one limiter call so a retryable job failure resubmits the statement.
+                    self.limiter.call("jobs", lambda: self.client.query(ddl, job_config=job_config).result())
+                else:
+                    # Plain CREATE and DML such as INSERT must not run twice, so only the submission is retried, under
+                    # a fixed job ID that BigQuery deduplicates; the job's own outcome is never resubmitted.
+                    job_id = f"plant_onboarding_{uuid.uuid4().hex}"
+                    job = self.limiter.call("jobs", self._submit_job, ddl, job_config, job_id)
+                    job.result()
                 print(f"[DEBUG] DDL execution successful.")
             except Exception as e:
                 print(f"[ERROR] Failed to execute DDL: {e}")
@@ -127,6 +225,55 @@ class BigQueryClient:
         else:
             print(f"[MOCK EXECUTION] Not executing DDL because BigQuery client is not available.\n--- DDL Statement ---\n{ddl}\n---------------------")
 
+    def _submit_job(self, sql: str, job_config, job_id: str):
+        try:
+            return self.client.query(sql, job_config=job_config, job_id=job_id, job_retry=None)
+        except Conflict:
+            # An earlier attempt reached BigQuery before its response was lost; reuse that job.
+            return self.client.get_job(job_id)
+
+    def estimate_query_bytes(self, sql: str) -> Optional[int]:
+        """Returns the bytes a query would scan, from a free dry run, or None if it cannot be estimated."""
+        if not self.real_client:
+            return None
+
+        from google.cloud import bigquery
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False, use_legacy_sql=False)
+        try:
+            query_job = self.limiter.call("jobs", self.client.query, sql, job_config=job_config)
+            return query_job.total_bytes_processed
+        except Exception as e:
+            print(f"[WARNING] Dry run failed: {e}")
+            return None
+
+    def _get_table_layout(self, table_ref) -> dict:
+        """Extracts partitioning, clustering and carried-over options from a BigQuery table."""
+        layout = {"cluster_columns": table_ref.clustering_fields or [], "options": {}}
+        time_partitioning = table_ref.time_partitioning
+        if time_partitioning:
+            layout["partition_column"] = time_partitioning.field
+            layout["partition_type"] = time_partitioning.type_
+            if time_partitioning.expiration_ms:
+                layout["options"]["partition_expiration_days"] = time_partitioning.expiration_ms / 86400000
+        elif table_ref.range_partitioning:
+            range_partitioning = table_ref.range_partitioning
+            layout["partition_column"] = range_partitioning.field
+            layout["range_partitioning"] = {
+                "start": range_partitioning.range_.start,
+                "end": range_partitioning.range_.end,
+                "interval": range_partitioning.range_.interval,
+            }
+        if table_ref.require_partition_filter:
+            layout["options"]["require_partition_filter"] = True
+        if table_ref.description:
+            layout["options"]["description"] = table_ref.description
+        # Absolute table expiration is deliberately not carried over; it would expire new plant tables with the blueprint.
+        return layout
+
+    def _list_tables(self, dataset_path: str):
+        # Pages are fetched lazily by the iterator, so materialize them inside the limiter.
+        return self.limiter.call("metadata", lambda: list(self.client.list_tables(dataset_path)))
+
     def _get_mock_tables(self, dataset_id: str) -> List[Table]:
         return [
             Table(
@@ -146,3 +293,63 @@ class BigQueryClient:
                 sql=f"SELECT * FROM `{self.project_id}.{dataset_id}.{dataset_id}_orders`"
             )
         ]
+
+def _api_column(schema_field) -> Column:
+    return Column(
+        name=schema_field.name, data_type=schema_field.field_type, mode=schema_field.mode,
+        fields=[_api_column(f) for f in schema_field.fields],
+    )
+
+def _schema_column(column: Dict[str, Any]) -> Column:
+    """Converts an INFORMATION_SCHEMA.COLUMNS row, whose data_type spells out nested STRUCT and ARRAY types."""
+    result = _column_from_type(column["column_name"], exp.DataType.build(column["data_type"], dialect="bigquery"))
+    if column["is_nullable"] == "NO" and result.mode == "NULLABLE":
+        result.mode = "REQUIRED"
+    return result
+
+def _column_from_type(name: str, data_type: exp.DataType, required: bool = False) -> Column:
+    mode = "REQUIRED" if required else "NULLABLE"
+    if data_type.this == exp.DataType.Type.ARRAY:
+        data_type, mode = data_type.expressions[0], "REPEATED"
+    if data_type.this == exp.DataType.Type.STRUCT:
+        fields = [
+            _column_from_type(f.name, f.args["kind"], any(isinstance(c.kind, exp.NotNullColumnConstraint) for c in f.constraints))
+            for f in data_type.expressions if isinstance(f, exp.ColumnDef)
+        ]
+        return Column(name=name, data_type="RECORD", mode=mode, fields=fields)
+    # Drop parameters, e.g. STRING(10) or NUMERIC(10, 2).
+    base_type = re.match(r"\w+", data_type.sql(dialect="bigquery")).group(0)
+    return Column(name=name, data_type=LEGACY_TYPE_NAMES.get(base_type, base_type), mode=mode)
+
+def _ddl_partitioning(ddl: str) -> Dict[str, Any]:
+    """Recovers the partition type or integer range from a table's DDL, which INFORMATION_SCHEMA only reports there."""
+    match = re.search(r"^PARTITION BY (.+)$", ddl or "", re.MULTILINE)
+    if not match:
+        return {}
+    clause = match.group(1)
+    range_match = re.search(r"GENERATE_ARRAY\((-?\d+),\s*(-?\d+),\s*(\d+)\)", clause)
+    if range_match:
+        start, end, interval = (int(value) for value in range_match.groups())
+        return {"range_partitioning": {"start": start, "end": end, "interval": interval}}
+    unit_match = re.search(r"_TRUNC\(.+,\s*(\w+)\s*\)", clause)
+    return {"partition_type": unit_match.group(1).upper() if unit_match else "DAY"}
+
+def _table_options(options: Dict[str, str]) -> Dict[str, Any]:
+    """Converts the carried-over TABLE_OPTIONS values the same way `_get_table_layout` reads them from the API."""
+    result = {}
+    if options.get("partition_expiration_days"):
+        result["partition_expiration_days"] = float(options["partition_expiration_days"])
+    if (options.get("require_partition_filter") or "").lower() == "true":
+        result["require_partition_filter"] = True
+    if options.get("description"):
+        # Option values are SQL literals, e.g. "Orders by day".
+        result["description"] = sqlglot.parse_one(options["description"], read="bigquery").this
+    return result
+
+def _ddl_query(ddl: str) -> Optional[str]:
+    """Extracts the defining query from CREATE MATERIALIZED VIEW DDL."""
+    try:
+        query = sqlglot.parse_one(ddl, read="bigquery").expression
+    except ParseError:
+        return None
+    return query.sql(dialect="bigquery") if query else None
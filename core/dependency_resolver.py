@@ -1,7 +1,30 @@
-from typing import List
+from typing import Dict, Iterable, List, Set
 import networkx as nx
 from models.schema_objects import SchemaObject
 
+def build_dependency_graph(dependencies: Dict[str, List[str]]) -> nx.DiGraph:
+    """Builds a graph with an edge from each prerequisite to the object that depends on it."""
+    graph = nx.DiGraph()
+    for obj_name, deps in dependencies.items():
+        graph.add_node(obj_name)
+        for dep_name in deps:
+            graph.add_edge(dep_name, obj_name)
+    return graph
+
+def upstream_closure(selected: Iterable[str], dependencies: Dict[str, List[str]]) -> Set[str]:
+    """Returns the selected objects plus every object they transitively depend on."""
+    graph = build_dependency_graph(dependencies)
+    closure = set(selected)
+    for name in list(closure):
+        if name in graph:
+            closure |= nx.ancestors(graph, name)
+    return closure
+
+def downstream_impact(names: Iterable[str], dependencies: Dict[str, List[str]]) -> Dict[str, Set[str]]:
+    """Maps each of `names` to every object that transitively depends on it."""
+    graph = build_dependency_graph(dependencies)
+    return {name: nx.descendants(graph, name) if name in graph else set() for name in names}
+
 def resolve_creation_order(schema_objects: List[SchemaObject], dependencies: dict) -> List[SchemaObject]:
     """Determine correct order to create tables and views"""
     graph = nx.DiGraph()
@@ -9,9 +32,11 @@ def resolve_creation_order(schema_objects: List[SchemaObject], dependencies: dic
     for obj in schema_objects:
         graph.add_node(obj.name)
 
+    # Only order within the given objects; dependencies on objects outside the plan are ignored.
     for obj_name, deps in dependencies.items():
         for dep_name in deps:
-            graph.add_edge(dep_name, obj_name)
+            if dep_name in graph and obj_name in graph:
+                graph.add_edge(dep_name, obj_name)
 
     try:
         sorted_nodes = list(nx.topological_sort(graph))
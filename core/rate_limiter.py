@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict
+
+from google.api_core import exceptions as api_exceptions
+
+# Per-API limits: sustained requests/second, burst size and maximum in-flight calls.
+# Kept below the published BigQuery and Vertex AI defaults so shared projects keep headroom.
+DEFAULT_LIMITS = {
+    "jobs": {"rate": 5.0, "burst": 10, "concurrency": 50},
+    "metadata": {"rate": 50.0, "burst": 100, "concurrency": 20},
+    "generative": {"rate": 1.0, "burst": 5, "concurrency": 4},
+}
+
+RETRYABLE_EXCEPTIONS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.GatewayTimeout,
+)
+# BigQuery reports some quota errors as 403s; the reason field tells them apart.
+RETRYABLE_REASONS = {"rateLimitExceeded", "quotaExceeded", "backendError", "internalError"}
+
+@dataclass
+class ApiMetrics:
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    throttle_wait_seconds: float = 0.0
+    backoff_wait_seconds: float = 0.0
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Blocks until a token is available and returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class RateLimiter:
+    """Token bucket, concurrency cap and jittered retry per API, shared by all clients and agents."""
+
+    def __init__(self, limits: Dict[str, Dict] = None, max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0):
+        limits = limits or DEFAULT_LIMITS
+        self.buckets = {api: TokenBucket(l["rate"], l["burst"]) for api, l in limits.items()}
+        self.semaphores = {api: threading.BoundedSemaphore(l["concurrency"]) for api, l in limits.items()}
+        self._metrics = {api: ApiMetrics() for api in limits}
+        self._metrics_lock = threading.Lock()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def call(self, api: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs `fn` under the limits for `api`, retrying retryable errors with backoff."""
+        if api not in self.buckets:
+            raise ValueError(f"Unknown API '{api}'. Expected one of {sorted(self.buckets)}.")
+
+        attempt = 0
+        while True:
+            throttled = self.buckets[api].acquire()
+            # Waiting for a free concurrency slot is throttling too.
+            blocked_since = time.monotonic()
+            with self.semaphores[api]:
+                throttled += time.monotonic() - blocked_since
+                self._record(api, calls=1, throttle_wait_seconds=throttled)
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        self._record(api, failures=1)
+                        raise
+                    error = e
+            # Full jitter keeps concurrent callers from retrying in lockstep.
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            attempt += 1
+            print(f"[WARNING] Retryable {api} error (attempt {attempt}/{self.max_retries}), retrying in {delay:.1f}s: {error}")
+            self._record(api, retries=1, backoff_wait_seconds=delay)
+            time.sleep(delay)
+
+    def metrics(self) -> Dict[str, Dict]:
+        with self._metrics_lock:
+            return {api: asdict(m) for api, m in self._metrics.items()}
+
+    def _record(self, api: str, **deltas):
+        with self._metrics_lock:
+            m = self._metrics[api]
+            for key, value in deltas.items():
+                setattr(m, key, getattr(m, key) + value)
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, RETRYABLE_EXCEPTIONS):
+        return True
+    errors = getattr(error, "errors", None) or []
+    return any(isinstance(err, dict) and err.get("reason") in RETRYABLE_REASONS for err in errors)
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide limiter so every client draws from the same quota budget."""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
+
+from core.bigquery_client import BigQueryClient
+from models.schema_objects import Column, SchemaObject, Table, View, MaterializedView
+from utils.naming_utils import NameMapping
+
+FINGERPRINT_INDEX_PATH = "schema_fingerprints.json"
+
+# Plant-specific parts of a schema are replaced by these before hashing, so every plant
+# generated from the same blueprint shares the same fingerprints.
+PLANT_PLACEHOLDER = "__plant__"
+DISCRIMINATOR_PLACEHOLDER = "__discriminator_value__"
+
+# BigQuery reports legacy type names for columns declared with standard SQL aliases.
+TYPE_ALIASES = {"INT64": "INTEGER", "FLOAT64": "FLOAT", "BOOL": "BOOLEAN", "STRUCT": "RECORD"}
+
+@dataclass
+class PlantFingerprint:
+    plant: str
+    root: str
+    objects: Dict[str, str] = field(default_factory=dict)
+
+def fingerprint_plant(schema_objects: List[SchemaObject], plant: str, discriminator_column: str = None, discriminator_value=None) -> PlantFingerprint:
+    """Hashes every object of a plant and rolls the hashes up into a single root hash."""
+    names = NameMapping(plant, PLANT_PLACEHOLDER)
+    objects = {
+        names.new_name(obj.name): fingerprint_object(obj, plant, discriminator_column, discriminator_value)
+        for obj in schema_objects
+    }
+    root = _sha256("\n".join(f"{name}:{digest}" for name, digest in sorted(objects.items())))
+    return PlantFingerprint(plant=plant, root=root, objects=objects)
+
+def fingerprint_object(obj: SchemaObject, plant: str, discriminator_column: str = None, discriminator_value=None) -> str:
+    """Hashes the structure of one object with its plant-specific names and filter values abstracted away."""
+    if isinstance(obj, Table):
+        parts = [obj.schema_type] + [_column_signature(c) for c in obj.columns]
+        parts.append(json.dumps({
+            "partition_column": obj.partition_column,
+            "partition_type": obj.partition_type,
+            "range_partitioning": obj.range_partitioning,
+            "cluster_columns": list(obj.cluster_columns or []),
+            "options": obj.options or {},
+        }, sort_keys=True, default=str))
+    elif isinstance(obj, View):
+        parts = [obj.schema_type, normalize_view_sql(obj.sql, plant, obj.project, discriminator_column, discriminator_value)]
+        if isinstance(obj, MaterializedView):
+            parts.append(json.dumps({
+                "partition_column": obj.partition_column,
+                "partition_type": obj.partition_type,
+                "range_partitioning": obj.range_partitioning,
+                "cluster_columns": list(obj.cluster_columns or []),
+                "refresh_schedule": int(obj.refresh_schedule) if obj.refresh_schedule else None,
+                "auto_refresh": obj.auto_refresh,
+            }, sort_keys=True))
+    else:
+        raise TypeError(f"Unsupported schema object type: {type(obj)}")
+    return _sha256("\n".join(parts))
+
+def _column_signature(column: Column) -> str:
+    signature = f"{column.name.lower()} {TYPE_ALIASES.get(column.data_type.upper(), column.data_type.upper())} {(column.mode or 'NULLABLE').upper()}"
+    if column.fields:
+        signature += f"<{', '.join(_column_signature(f) for f in column.fields)}>"
+    return signature
+
+def normalize_view_sql(sql: str, plant: str, project: str, discriminator_column: str = None, discriminator_value=None) -> str:
+    """Canonicalizes view SQL so formatting, project, plant dataset and discriminator value don't affect the hash."""
+    names = NameMapping(plant, PLANT_PLACEHOLDER)
+    try:
+        tree = sqlglot.parse_one(sql or "", read="bigquery")
+    except ParseError:
+        # Unparseable SQL still gets a stable, whitespace-insensitive fingerprint.
+        return names.rewrite_sql(re.sub(r"\s+", " ", sql or "").strip())
+
+    for table in tree.find_all(exp.Table):
+        if table.catalog == project:
+            table.set("catalog", None)
+        if table.db == plant:
+            table.set("db", exp.to_identifier(PLANT_PLACEHOLDER))
+        if table.name:
+            table.set("this", exp.to_identifier(names.new_name(table.name)))
+
+    if discriminator_column and discriminator_value is not None:
+        for literal in _discriminator_literals(tree, discriminator_column):
+            if literal.this == str(discriminator_value):
+                literal.replace(exp.Literal.string(DISCRIMINATOR_PLACEHOLDER))
+
+    return tree.sql(dialect="bigquery", normalize=True)
+
+def _discriminator_literals(tree: exp.Expression, discriminator_column: str) -> List[exp.Literal]:
+    literals = []
+    for predicate in tree.find_all(exp.EQ, exp.In):
+        if isinstance(predicate, exp.In):
+            sides = [(predicate.this, predicate.expressions)]
+        else:
+            sides = [(predicate.this, [predicate.expression]), (predicate.expression, [predicate.this])]
+        for column, others in sides:
+            if isinstance(column, exp.Column) and column.name.lower() == discriminator_column.lower():
+                for other in others:
+                    # Typed literals such as DATE '2008-01-01' wrap the literal in a cast.
+                    while isinstance(other, (exp.Cast, exp.Paren)):
+                        other = other.this
+                    if isinstance(other, exp.Literal):
+                        literals.append(other)
+    return literals
+
+def diff_fingerprints(expected: PlantFingerprint, actual: PlantFingerprint) -> Dict[str, str]:
+    """Returns drifted objects mapped to "missing", "unexpected" or "changed"."""
+    drift = {}
+    for name, digest in expected.objects.items():
+        if name not in actual.objects:
+            drift[name] = "missing"
+        elif actual.objects[name] != digest:
+            drift[name] = "changed"
+    for name in actual.objects:
+        if name not in expected.objects:
+            drift[name] = "unexpected"
+    return drift
+
+def load_fingerprint_index(path: str = FINGERPRINT_INDEX_PATH) -> Dict[str, PlantFingerprint]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return {plant: PlantFingerprint(**data) for plant, data in json.load(f).items()}
+
+def save_fingerprint_index(index: Dict[str, PlantFingerprint], path: str = FINGERPRINT_INDEX_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({plant: asdict(fp) for plant, fp in sorted(index.items())}, f, indent=2)
+    os.replace(tmp_path, path)
+
+def record_fingerprint(fingerprint: PlantFingerprint, path: str = FINGERPRINT_INDEX_PATH):
+    """Stores a plant's expected fingerprint in the index, replacing any previous entry."""
+    index = load_fingerprint_index(path)
+    index[fingerprint.plant] = fingerprint
+    save_fingerprint_index(index, path)
+
+@dataclass
+class DriftReport:
+    drifted: Dict[str, Dict[str, str]] = field(default_factory=dict)  # plant -> object -> drift status
+    errors: Dict[str, str] = field(default_factory=dict)  # plant -> why its live schema could not be fetched
+
+def scan_for_drift(client: BigQueryClient, index: Dict[str, PlantFingerprint], config: Dict, max_workers: int = 8) -> DriftReport:
+    """Fingerprints every indexed plant's live schema and reports object-level drift for plants whose root differs.
+
+    Each plant costs one INFORMATION_SCHEMA query; plants that cannot be fetched are reported as errors.
+    """
+    discriminator_column = config.get('discriminator_column')
+    plants_config = config.get('plants') or {}
+
+    def scan(expected: PlantFingerprint):
+        plant = expected.plant
+        try:
+            live_objects = client.get_dataset_objects(plant)
+        except Exception as e:
+            return None, str(e)
+        discriminator_value = (plants_config.get(plant) or {}).get('discriminator_value')
+        actual = fingerprint_plant(live_objects, plant, discriminator_column, discriminator_value)
+        # Matching roots mean every object matches, so the per-object diff only runs for drifted plants.
+        if actual.root == expected.root:
+            return None, None
+        return diff_fingerprints(expected, actual), None
+
+    report = DriftReport()
+    # Queries are throttled by the shared rate limiter, so threads only overlap network waits.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for plant, (drift, error) in zip(index.keys(), executor.map(scan, index.values())):
+            if error:
+                report.errors[plant] = error
+            elif drift is not None:
+                report.drifted[plant] = drift
+    return report
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
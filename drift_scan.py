@@ -0,0 +1,46 @@
+import argparse
+import yaml
+
+from config import get_gcp_project_id
+from core.bigquery_client import BigQueryClient
+from core.schema_fingerprint import FINGERPRINT_INDEX_PATH, load_fingerprint_index, scan_for_drift
+
+CONFIG_FILE_PATH = "plant_onboarding_config.yaml"
+
+def run_drift_scan(index_path: str, max_workers: int):
+    """
+    Compares every onboarded plant's live schema against the fingerprint recorded
+    at onboarding time and reports the objects that drifted.
+    """
+    index = load_fingerprint_index(index_path)
+    if not index:
+        print(f"[ERROR] No fingerprints found in `{index_path}`. Onboard a plant first.")
+        return
+
+    try:
+        client = BigQueryClient(project_id=get_gcp_project_id())
+        with open(CONFIG_FILE_PATH, 'r') as f:
+            config = yaml.safe_load(f)
+    except Exception as e:
+        print(f"[ERROR] Configuration Error: {e}")
+        return
+
+    print(f"Scanning {len(index)} onboarded plants for drift...")
+    report = scan_for_drift(client, index, config, max_workers=max_workers)
+
+    matching = len(index) - len(report.drifted) - len(report.errors)
+    print(f"\n{matching} of {len(index)} plants match their onboarded schema.")
+    for plant, error in sorted(report.errors.items()):
+        print(f"[ERROR] Could not fetch the live schema of {plant}: {error}")
+    for plant, drift in sorted(report.drifted.items()):
+        print(f"\n{plant}: {len(drift)} drifted object(s)")
+        for obj_name, status in sorted(drift.items()):
+            print(f"  - {obj_name}: {status}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect schema drift across all onboarded plants.")
+    parser.add_argument("--index", default=FINGERPRINT_INDEX_PATH, help="Path to the fingerprint index written during onboarding.")
+    parser.add_argument("--max_workers", type=int, default=8, help="Number of plants to scan concurrently.")
+    args = parser.parse_args()
+
+    run_drift_scan(args.index, args.max_workers)
@@ -6,6 +6,7 @@ class Column:
     name: str
     data_type: str
     mode: str = "NULLABLE"
+    fields: List["Column"] = field(default_factory=list)  # Subfields of RECORD columns
 
 @dataclass
 class SchemaObject:
@@ -16,6 +17,11 @@ class SchemaObject:
 @dataclass
 class Table(SchemaObject):
     columns: List[Column] = field(default_factory=list)
+    partition_column: str = None  # None with a partition_type means ingestion-time partitioning
+    partition_type: str = None  # DAY, HOUR, MONTH or YEAR
+    range_partitioning: Dict[str, int] = None  # start, end and interval for integer range partitioning
+    cluster_columns: List[str] = field(default_factory=list)
+    options: Dict[str, Any] = field(default_factory=dict)
     schema_type: str = "TABLE"
 
 @dataclass
@@ -28,7 +34,10 @@ class View(SchemaObject):
 
 @dataclass
 class MaterializedView(View):
-    partition_column: str = None
+    columns: List[Column] = field(default_factory=list)  # Output columns, when known; needed to partition by a column.
+    partition_column: str = None  # Bare output column name; the DDL expression comes from partition_expression
+    partition_type: str = None  # DAY, HOUR, MONTH or YEAR, matching the base table
+    range_partitioning: Dict[str, int] = None
     cluster_columns: List[str] = field(default_factory=list)
     refresh_schedule: str = None
     auto_refresh: bool = True
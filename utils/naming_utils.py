@@ -1,8 +1,74 @@
 import re
+from typing import Dict, Optional
 
-def generate_new_name(old_name: str, source_plant: str, target_plant: str) -> str:
-    """Generates a new table or view name for the target plant."""
-    # Use a regular expression to replace the source plant name when it's followed by an underscore
-    # or is at the end of the string. This handles cases like 'plant1_orders' or 'plant1'.
-    pattern = re.escape(source_plant) + r'(_|$)'
-    return re.sub(pattern, target_plant + r'\1', old_name)
\ No newline at end of file
+# String literals (triple-quoted first) and comments, where names are data rather than references.
+_SKIPPED_SQL_SPANS = (
+    r"('''.*?'''" r'|""".*?"""' r"|'(?:\\.|[^'\\])*'" r'|"(?:\\.|[^"\\])*"' r"|--[^\n]*|#[^\n]*|/\*.*?\*/)"
+)
+
+class NameMapping:
+    """Bidirectional source -> target name index for one plant onboarding.
+
+    Every object is registered at three granularities: short (`orders`), dataset
+    qualified (`plant1.orders`) and fully qualified (`project.plant1.orders`).
+    BigQuery object names cannot contain dots, so the granularities never collide
+    and a lookup always returns a name at the same granularity as its key.
+    """
+
+    def __init__(self, source_plant: str, target_plant: str):
+        self.source_plant = source_plant
+        self.target_plant = target_plant
+        # Replace the source plant name when it's followed by an underscore or ends the name,
+        # e.g. 'plant1_orders' or 'plant1'.
+        self._name_pattern = re.compile(re.escape(source_plant) + r'(_|$)')
+        self._forward: Dict[str, str] = {}
+        self._reverse: Dict[str, str] = {}
+        self._reference_pattern = None
+
+    def new_name(self, old_name: str) -> str:
+        """Generates the target plant name for a source object name."""
+        return self._name_pattern.sub(self.target_plant + r'\1', old_name)
+
+    def add(self, name: str, dataset: str, project: str) -> str:
+        """Registers an object at all granularities and returns its new short name."""
+        new_name = self.new_name(name)
+        self._put(name, new_name)
+        self._put(f"{dataset}.{name}", f"{self.target_plant}.{new_name}")
+        self._put(f"{project}.{dataset}.{name}", f"{project}.{self.target_plant}.{new_name}")
+        return new_name
+
+    def _put(self, old: str, new: str):
+        self._forward[old] = new
+        self._reverse[new] = old
+        self._reference_pattern = None
+
+    def get(self, old_name: str, default: Optional[str] = None) -> Optional[str]:
+        """Returns the target name for a source name."""
+        return self._forward.get(old_name, default)
+
+    def source_name(self, new_name: str) -> Optional[str]:
+        """Returns the source name a target name was generated from."""
+        return self._reverse.get(new_name)
+
+    def rewrite_sql(self, sql: str) -> str:
+        """Rewrites every mapped source reference in a SQL string to its target name."""
+        if not self._forward or not sql:
+            return sql
+        if self._reference_pattern is None:
+            # Longest names first so a fully qualified reference wins over its short suffix.
+            names = sorted(self._forward, key=len, reverse=True)
+            self._reference_pattern = re.compile(
+                _SKIPPED_SQL_SPANS + r'|(?<![\w.])(' + '|'.join(re.escape(n) for n in names) + r')(?!\w)',
+                re.DOTALL,
+            )
+        # String literals and comments match the first group and are kept as they are.
+        return self._reference_pattern.sub(lambda m: m.group(1) or self._forward[m.group(2)], sql)
+
+    def __contains__(self, old_name: str) -> bool:
+        return old_name in self._forward
+
+    def __len__(self) -> int:
+        return len(self._forward)
+
+    def __repr__(self) -> str:
+        return f"NameMapping({self.source_plant!r} -> {self.target_plant!r}, {len(self._forward)} names)"